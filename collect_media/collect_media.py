@@ -1,11 +1,11 @@
 """
 Script Name: Collect Media
-Script Version: 1.0
+Script Version: 1.10
 Flame Version: 2023
 Author: Kyle Obley (info@kyleobley.com)
 
 Creation Date: 10.08.21
-Modification Date: 07.12.25
+Modification Date: 10.18.26
 
 Description:
 
@@ -14,6 +14,51 @@ Description:
 
 Change Log:
 
+    v1.10: The list is now written by a streaming writer. Paths are sorted in chunks spilled to temp files and
+           merged, so the previous list, the new paths and the sorted copy are never all in memory at once. Every
+           list, manifest and checksum file is written to a temp file, fsynced and renamed into place. The .lock
+           file is now created atomically with O_EXCL so two artists can't both take it. The incremental manifest
+           is now collected_media.manifest.jsonl, one record per line. Runs append their changes and the file is
+           only rewritten once most of it is out of date. Paths and directories not seen in a run are pruned from
+           the manifest and the list. An existing collected_media.manifest.json is carried over on the first run.
+
+    v1.9: Added per-phase instrumentation (run_stats). Time spent in the Flame API traversal, clip and segment
+          extraction, audio collection, filesystem resolution and write-out is recorded along with counts of the
+          Flame objects visited, stat calls and directory listings, and appended as one JSON record per run to
+          collected_media.stats.jsonl.
+
+    v1.8: Added an optional checksum stage (checksum_files). Every collected file is hashed in chunks on a pool
+          of threads with xxhash when it's installed, BLAKE2 otherwise, and written to collected_media.checksums.
+          Files whose size and mtime match the previous checksums are not read again.
+
+    v1.7: Added a batch mode. all_workspaces scrapes every workspace the project exposes and all_batch_iterations
+          opens every batch iteration as a temporary batch group to scrape its reels. Everything shares the same
+          directory index so media used in several workspaces is only listed once.
+
+    v1.6: Added a sequence report (sequence_report). Frame counts, missing frames and total bytes for every
+          sequence and audio file are written to collected_media.report.csv using the sizes from the same
+          directory listing, so archive jobs can be sized without a separate du pass.
+
+    v1.5: Replaced the recursive build_list functions and the global clips/sequences lists with walk_workspace,
+          an explicit-stack generator yielding (kind, container_path, object). A second run in the same Flame
+          session no longer counts everything twice or holds on to the previous run's objects.
+
+    v1.4: Added a compact list format (compact_output). Instead of one line per frame, collected_media.ranges
+          holds one record per sequence with its directory, prefix, padding, extension, frame ranges and holes.
+          Run this script from the command line on a .ranges file to stream the full list into rsync.
+
+    v1.3: Added an incremental mode (incremental). A manifest is kept beside the list with the first-seen and
+          last-verified time of every path and the mtime and files of every sequence folder. Only folders whose
+          mtime changed are listed again and only new paths are appended to the list, without a backup.
+
+    v1.2: Split extraction into two stages. Paths are first collected from the Flame API on the main thread
+          and then resolved on disk by a thread pool (resolve_workers) so slow stats overlap. The final list
+          is unchanged.
+
+    v1.1: Added a per-run directory index. Every parent directory is now listed once with os.scandir and
+          its files grouped by sequence pattern, so plates referenced by dozens of segments no longer
+          trigger a glob each time. A summary of the listings saved is printed at the end of the run.
+
     v1.0: Merged Chris' 0.9.2 but changed the logic to not include a dated sub-folder for easier backups.
 
           Re-incorperated the ability for a custom save location.
@@ -65,142 +110,198 @@ Change Log:
 Important / Cavets:
     - We can not see into BFX so anything in there will not be caught.
     - This will only grab the used version of a versioned clip, not every version.
-    - This will only grab the latest batch iteration, not previous versions.
+    - This will only grab the latest batch iteration, not previous versions, unless all_batch_iterations is set.
+      Each iteration is then opened as a temporary batch group and removed once its paths have been extracted.
     - Within batch, only import nodes are seen, not read file nodes.
-    - Only works on the current workspace.
+    - Only works on the current workspace. all_workspaces will walk every workspace but only if the Flame API
+      exposes them on the project, otherwise we fall back to the current workspace.
     - Flame returns the path of an image sequence as the first frame in the sequence, not the first frame being
       used within said image sequence. For now the safest route is to find the last frame in the sequence on disk
       and use that to populate the list.
 
 To Do:
-    - Figure out how to dig into batch iteration reels
+    - Find a way to reach every workspace on versions of Flame that don't expose them to Python.
 
 
 """
 
-import flame
+import os
+import re
+import time
+import heapq
+import tempfile
+import threading
+import itertools
+import contextlib
+
+try:
+    import flame
+except ImportError:
+    # Running from the command line to expand a compact list
+    flame = None
 
-clips = []
-sequences = []
 uncached_only = True
 
+# Number of threads used to resolve paths on disk. Raise this for high latency storage.
+resolve_workers = 8
+
+# Keep a manifest next to the list and only append new paths instead of rewriting everything.
+incremental = False
+
+# Number of out of date manifest records tolerated on top of the live ones before the manifest is rewritten.
+manifest_slack = 10000
+
+# Write one record per sequence (collected_media.ranges) instead of one line per frame.
+compact_output = False
+
+# Write frame counts, missing frames and sizes per sequence to collected_media.report.csv
+sequence_report = False
+
+# Batch mode. Scrape every workspace in the project and/or every batch iteration, not just the current ones.
+all_workspaces = False
+all_batch_iterations = False
+
+# Checksum every collected file into collected_media.checksums for archive verification.
+checksum_files = False
+checksum_workers = 4
+checksum_chunk_size = 8 * 1024 * 1024
+checksum_batch_size = 1024
+
+# Append phase timings and API/filesystem counters for every run to collected_media.stats.jsonl
+run_stats = False
+
+# Number of paths sorted in memory at once before they are spilled to a temp file while writing the list.
+sort_chunk_size = 500000
+
 #
 # Scaning/Builing Functions
 #
 
-def build_list_folder(selection):
-    global clips
-    global sequences
+# Libraries that hold nothing we want to archive
+skipped_libraries = ["Timeline FX", "Grabbed References"]
+
+# Media panel containers and which of their attributes hold clips/sequences and sub-containers.
+# The current desktop can't be walked like a library desktop so it only gets reel groups and batch groups.
+container_items = {
+    "library": ("clips", "sequences"),
+    "folder": ("clips", "sequences"),
+    "reel": ("clips", "sequences"),
+}
+
+container_children = {
+    "library": ("folders", "reels", "reel_groups", "batch_groups", "desktops"),
+    "folder": ("folders", "reels", "reel_groups", "batch_groups", "desktops"),
+    "desktop": ("reels", "reel_groups", "batch_groups"),
+    "current_desktop": ("reel_groups", "batch_groups"),
+    "reel_group": ("reels",),
+    "batch_group": ("reels",),
+    "iteration_group": ("reels",),
+}
+
+attribute_kinds = {
+    "clips": "clip",
+    "sequences": "sequence",
+    "folders": "folder",
+    "reels": "reel",
+    "reel_groups": "reel_group",
+    "batch_groups": "batch_group",
+    "desktops": "desktop",
+}
+
+def object_name(item):
+    try:
+        return item.name.get_value()
+    except AttributeError:
+        return str(item.name)
+
+def iter_container(kind, container_path, container):
+    for attribute in container_items.get(kind, ()) + container_children.get(kind, ()):
+        child_kind = attribute_kinds[attribute]
+
+        for child in getattr(container, attribute) or []:
+            if child:
+                if child_kind in ("clip", "sequence"):
+                    yield child_kind, container_path, child
+                else:
+                    yield child_kind, container_path + "/" + object_name(child), child
+
+def iter_workspace_roots(workspace):
+    for library in workspace.libraries:
+        lib_name = library.name.get_value()
 
-    for folder in selection:
-        if folder:
-            if has_subfolder(folder):
-                build_list_folder(folder.folders)
+        if lib_name not in skipped_libraries:
+            yield "library", lib_name, library
 
-            for clip in folder.clips:
-                if clip:
-                    clips.append(clip)
+    yield "current_desktop", workspace.desktop.name.get_value(), workspace.desktop
 
-            for sequence in folder.sequences:
-                if sequence:
-                    sequences.append(sequence)
-                
-            if folder.reels:
-                build_list_reels(folder.reels)
+def iter_batch_iterations(container_path, batch_group):
+    for iteration in getattr(batch_group, "batch_iterations", None) or []:
+        if iteration:
+            yield "batch_iteration", container_path + "/" + object_name(iteration), iteration
+
+def open_batch_iteration(iteration):
+    try:
+        return iteration.open_as_batch_group()
+    except Exception as e:
+        print ("[ Collect Media ] WARNING: Could not open batch iteration %s: %s" % (object_name(iteration), str(e)))
 
-            if folder.reel_groups:
-                build_list_reel_group(folder.reel_groups)
+def remove_opened_iterations(opened_iterations):
+    for batch_group in opened_iterations:
+        try:
+            flame.delete(batch_group)
+        except Exception as e:
+            print ("[ Collect Media ] WARNING: Could not remove temporary batch group: %s" % str(e))
 
-            if folder.batch_groups:
-                build_list_batchgroups(folder.batch_groups)
+def is_opened_iteration(item, opened_iterations):
+    # Iterations are opened onto the current desktop, which is walked after the libraries
+    return any(item == opened for opened in opened_iterations)
 
-            if folder.desktops:
-                build_list_desktop(folder.desktops)
-        
-def build_list_desktop(selection):
-    global clips
-    global sequences
-
-    for desktop in selection:
-        if desktop:
-            if desktop.reels:
-                build_list_reels(desktop.reels)
-
-            if desktop.reel_groups:
-                build_list_reel_group(desktop.reel_groups)
-
-            if desktop.batch_groups:
-                build_list_batchgroups(desktop.batch_groups)
-
-def build_list_reels(selection):
-    global clips
-    global sequences
-
-    for reel in selection:
-        if reel:
-            for clip in reel.clips:
-                if clip:
-                    clips.append(clip)
-            for sequence in reel.sequences:
-                if sequence:
-                    sequences.append(sequence)
-
-def build_list_reel_group(selection):
-    global clips
-    global sequences
-
-    for reel_group in selection:
-        if reel_group:
-            for reel in reel_group.reels:
-                if reel:
-                    for clip in reel.clips:
-                        if clip:
-                            clips.append(clip)
-                    for sequence in reel.sequences:
-                        if sequence:
-                            sequences.append(sequence)
-
-def build_list_batchgroups(selection):
-    global clips
-    global sequences
-
-    for batchgroup in selection:
-        if batchgroup:
-            for reel in batchgroup.reels:
-                if reel:
-                    for clip in reel.clips:
-                        if clip:
-                            clips.append(clip)
-                    for sequence in reel.sequences:
-                        if sequence:
-                            sequences.append(sequence)
-
-def build_list_lose_clips(selection):
-    global clips
-
-    for clip in selection:
-        if clip:
-            clips.append(clip)
-
-def build_list_lose_sequence(selection):
-    global sequences
-
-    for sequence in selection:
-        if sequence:
-            sequences.append(sequence)
+def walk_workspace(workspace, batch_iterations=False, opened_iterations=None):
+    """
+    Walk every library and the current desktop of a workspace and yield
+    (kind, container_path, object) for every container, clip and sequence.
 
+    Uses an explicit stack of iterators so memory only grows with the depth of
+    the tree, nothing is kept between runs, and the caller can stop at any time.
 
+    With batch_iterations every previous iteration of a batch group is opened as
+    a temporary batch group and walked as well. Those groups are appended to
+    opened_iterations and must be deleted by the caller once it's done with them.
+    They land on the current desktop, so they are skipped there instead of being
+    scraped again and having their own iterations reopened.
+    """
+
+    stack = [iter_workspace_roots(workspace)]
+
+    while stack:
+        try:
+            kind, container_path, item = next(stack[-1])
+        except StopIteration:
+            stack.pop()
+            continue
+
+        if kind == "batch_group" and opened_iterations and is_opened_iteration(item, opened_iterations):
+            continue
+
+        yield kind, container_path, item
+
+        if kind in container_items or kind in container_children:
+            stack.append(iter_container(kind, container_path, item))
+
+        if batch_iterations:
+            if kind == "batch_group":
+                stack.append(iter_batch_iterations(container_path, item))
+
+            elif kind == "batch_iteration":
+                opened = open_batch_iteration(item)
+                if opened:
+                    opened_iterations.append(opened)
+                    stack.append(iter_container("iteration_group", container_path, opened))
 
 #
 # Helper Functions
 #
 
-def has_subfolder(folder):
-    if len(folder.folders) == 0:
-        return False
-    else:
-        return True
-
 def segments_in_sequence(sequence):
     segs_in_seq = []
     versions = sequence.versions[0:]
@@ -216,6 +317,586 @@ def segments_in_sequence(sequence):
     if segs_in_seq:
         return segs_in_seq
 
+#
+# Directory Index
+#
+
+class DirectoryIndex(object):
+    """
+    Per-run cache of directory listings.
+
+    Each parent directory is listed once with os.scandir and its files are grouped by
+    sequence pattern (prefix, frame padding, extension). Every later lookup in that
+    directory is then served from memory instead of another glob over the network.
+    """
+
+    # Last run of digits right before the extension is the frame number
+    sequence_pattern = re.compile(r'^(.*?)(\d+)(\.[^.]+)$')
+
+    def __init__(self, known_directories=None, record_sizes=False):
+        self.listings = {}
+        self.record_sizes = record_sizes
+        self.lookups = 0
+        self.scans = 0
+        self.scan_time = 0.0
+        self.stat_calls = 0
+
+        # Incremental mode. Directories whose mtime still matches the manifest are rebuilt
+        # from the stored file names rather than listed again. Everything we see is recorded
+        # in directory_mtimes so the manifest can be updated at the end of the run.
+        self.known_directories = known_directories
+        self.directory_mtimes = {}
+        self.reused = 0
+
+        # Lookups come from the resolve thread pool. The per-directory locks make sure
+        # a directory is only listed once even when several threads ask for it together.
+        self.lock = threading.Lock()
+        self.directory_locks = {}
+
+    def listing(self, directory):
+        listing = self.listings.get(directory)
+        if listing is not None:
+            return listing
+
+        with self.lock:
+            directory_lock = self.directory_locks.setdefault(directory, threading.Lock())
+
+        with directory_lock:
+            listing = self.listings.get(directory)
+            if listing is not None:
+                return listing
+
+            start = time.time()
+            names = None
+            sizes = {}
+            mtime = None
+
+            if self.known_directories is not None:
+                # Stat before listing so a change during the listing is picked up next run
+                with self.lock:
+                    self.stat_calls += 1
+
+                try:
+                    mtime = os.stat(directory or ".").st_mtime_ns
+                except OSError:
+                    mtime = None
+
+                known = self.known_directories.get(directory)
+                if mtime is not None and known and known[0] == mtime:
+                    names = known[1]
+
+            if names is None:
+                names, sizes, stat_calls = self.scan(directory)
+
+                with self.lock:
+                    self.scans += 1
+                    self.scan_time += time.time() - start
+                    self.stat_calls += stat_calls
+            else:
+                with self.lock:
+                    self.reused += 1
+
+            if mtime is not None:
+                self.directory_mtimes[directory] = [mtime, sorted(names)]
+
+            listing = self.group(directory, names) + (sizes,)
+            self.listings[directory] = listing
+
+        return listing
+
+    def scan(self, directory):
+        names = []
+        sizes = {}
+
+        # is_file() stats the entry when the filesystem doesn't return its type with the listing
+        stat_calls = 0
+
+        try:
+            with os.scandir(directory or ".") as entries:
+                for entry in entries:
+                    try:
+                        stat_calls += 1
+                        if entry.is_file():
+                            names.append(entry.name)
+
+                            # Grab the size while we're holding the entry for the report
+                            if self.record_sizes:
+                                stat_calls += 1
+                                sizes[entry.name] = entry.stat().st_size
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+
+        return names, sizes, stat_calls
+
+    def group(self, directory, names):
+        files = set(names)
+        groups = {}
+
+        for name in names:
+            match = self.sequence_pattern.match(name)
+            if match:
+                prefix, frame, ext = match.groups()
+                key = (prefix, len(frame), ext)
+                groups.setdefault(key, []).append(os.path.join(directory, name))
+
+        return files, groups
+
+    def is_file(self, filepath):
+        with self.lock:
+            self.lookups += 1
+        directory, name = os.path.split(filepath)
+        files = self.listing(directory)[0]
+        return name in files
+
+    def size(self, filepath):
+        directory, name = os.path.split(filepath)
+        sizes = self.listing(directory)[2]
+
+        # Reused directories from the manifest have no sizes yet
+        size = sizes.get(name)
+        if size is None:
+            with self.lock:
+                self.stat_calls += 1
+
+            try:
+                size = os.stat(filepath).st_size
+            except OSError:
+                size = 0
+            sizes[name] = size
+
+        return size
+
+    def sequence(self, filepath):
+        with self.lock:
+            self.lookups += 1
+        directory, name = os.path.split(filepath)
+        files, groups = self.listing(directory)[:2]
+
+        if name not in files:
+            return []
+
+        match = self.sequence_pattern.match(name)
+        if match:
+            prefix, frame, ext = match.groups()
+            return list(groups[(prefix, len(frame), ext)])
+
+        # Not a numbered file, so it's a still
+        return [filepath]
+
+    def summary(self):
+        summary = ("[ Collect Media ] Directory index: %i lookups served from %i directory listings "
+                   "(%i listings saved), listing took %.2f seconds"
+                   % (self.lookups, self.scans, self.lookups - self.scans, self.scan_time))
+
+        if self.known_directories is not None:
+            summary += "\n[ Collect Media ] Directory index: %i unchanged directories reused from the manifest" % self.reused
+
+        return summary
+
+    def counters(self):
+        return {
+            "lookups": self.lookups,
+            "directory_listings": self.scans,
+            "directories_reused": self.reused,
+            "stat_calls": self.stat_calls,
+        }
+
+#
+# Run Stats
+#
+
+class RunStats(object):
+    """
+    Phase timings and counters for a single run, written out as one JSON record.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            with self.lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, **info):
+        record = dict(info)
+        record["phases"] = dict([(name, round(seconds, 4)) for name, seconds in self.phases.items()])
+        record["counters"] = dict(self.counters)
+        return record
+
+def write_run_stats(record, location):
+    import json
+
+    # One JSON record per line so runs can be appended and compared over time.
+    # The earlier runs are rewritten along with the new one so an interrupted run never leaves half a line.
+    previous = ""
+    if os.path.isfile(location):
+        with open(location) as f:
+            previous = f.read()
+        if previous and not previous.endswith("\n"):
+            previous += "\n"
+
+    with atomic_write(location) as f:
+        f.write(previous + json.dumps(record, sort_keys=True) + "\n")
+
+#
+# Writer Functions
+#
+
+def acquire_lock(lock_location):
+    # O_EXCL makes creating the lock atomic so two artists can't both end up holding it
+    try:
+        fd = os.open(lock_location, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+    except FileExistsError:
+        return None
+
+    # Note who holds the lock in case it's ever left behind
+    import socket
+    os.write(fd, ("%s %i\n" % (socket.gethostname(), os.getpid())).encode())
+
+    return fd
+
+def release_lock(fd, lock_location):
+    os.close(fd)
+    os.remove(lock_location)
+
+def fsync_directory(directory):
+    # Make the rename itself durable. Not every filesystem lets us open a directory.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextlib.contextmanager
+def atomic_write(location, newline=None):
+    # Write next to the real file, fsync it and swap it in so a crash never leaves half a file
+    temp_location = location + ".tmp"
+
+    try:
+        with open(temp_location, "w", newline=newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_location, location)
+    except BaseException:
+        if os.path.exists(temp_location):
+            os.remove(temp_location)
+        raise
+
+    fsync_directory(os.path.dirname(location) or ".")
+
+def spill_sorted_chunk(chunk):
+    fd, spill_location = tempfile.mkstemp(prefix="collect_media.", suffix=".sort")
+
+    with os.fdopen(fd, "w") as f:
+        for path in sorted(set(chunk)):
+            f.write(path + "\n")
+
+    return spill_location
+
+def read_spilled_chunk(f):
+    for line in f:
+        yield line[:-1]
+
+def iter_sorted_unique(paths, chunk_size):
+    """
+    Sort and de-duplicate paths with an external merge sort. Chunks of chunk_size
+    paths are sorted in memory and spilled to temp files which are then merged,
+    so only one chunk is ever held in memory.
+    """
+
+    chunk = []
+    spills = []
+
+    try:
+        for path in paths:
+            chunk.append(path)
+            if len(chunk) >= chunk_size:
+                spills.append(spill_sorted_chunk(chunk))
+                chunk = []
+
+        # Everything fit in one chunk, no need to touch the disk
+        if not spills:
+            for path in sorted(set(chunk)):
+                yield path
+            return
+
+        if chunk:
+            spills.append(spill_sorted_chunk(chunk))
+            chunk = []
+
+        files = [open(spill_location) for spill_location in spills]
+        try:
+            previous = None
+            for path in heapq.merge(*[read_spilled_chunk(f) for f in files]):
+                if path != previous:
+                    yield path
+                    previous = path
+        finally:
+            for f in files:
+                f.close()
+
+    finally:
+        for spill_location in spills:
+            os.remove(spill_location)
+
+def write_sorted_list(paths, location, chunk_size):
+    # Same layout as before, one path per line without a trailing newline.
+    # Returns the number of paths written, counted as they stream past.
+    count = 0
+
+    with atomic_write(location) as f:
+        for path in iter_sorted_unique(paths, chunk_size):
+            if count:
+                f.write("\n")
+            f.write(path)
+            count += 1
+
+    return count
+
+def append_to_list(paths, location):
+    # Copy the current list into the temp file and add the new paths after it, so a crash
+    # while appending never leaves a truncated list. The list has no trailing newline.
+    import shutil
+
+    with atomic_write(location) as f:
+        if os.path.isfile(location):
+            with open(location) as current:
+                shutil.copyfileobj(current, f)
+
+        for path in paths:
+            if f.tell() > 0:
+                f.write("\n")
+            f.write(path)
+
+#
+# Manifest Functions
+#
+
+def load_manifest(manifest_location, legacy_location=None):
+    """
+    Read the manifest, one JSON record per line. Later records replace earlier ones:
+    {"path": ..., "first_seen": ...} and {"directory": ..., "mtime": ..., "names": [...]}
+    add or update an entry, {"removed_path": ...} and {"removed_directory": ...} drop it.
+    """
+    import json
+
+    # Each path is held as [first_seen, last_verified], last_verified is only set once a run sees it
+    manifest = {"paths": {}, "directories": {}, "records": 0, "rewrite": False}
+
+    if os.path.isfile(manifest_location):
+        try:
+            with open(manifest_location) as f:
+                skipped = 0
+                line = ""
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        if "path" in record:
+                            manifest["paths"][record["path"]] = [record["first_seen"], None]
+                        elif "directory" in record:
+                            manifest["directories"][record["directory"]] = [record["mtime"], record["names"]]
+                        elif "removed_path" in record:
+                            manifest["paths"].pop(record["removed_path"], None)
+                        elif "removed_directory" in record:
+                            manifest["directories"].pop(record["removed_directory"], None)
+                        manifest["records"] += 1
+                    except (ValueError, KeyError, TypeError):
+                        skipped += 1
+
+            # A line cut short by an interrupted run is skipped. Rewrite the file so the next record doesn't land on it.
+            if skipped:
+                print ("[ Collect Media ] WARNING: Skipped %i malformed lines in %s" % (skipped, manifest_location))
+            if skipped or not line.endswith("\n"):
+                manifest["rewrite"] = True
+        except OSError as e:
+            print ("[ Collect Media ] WARNING: Could not read manifest %s, starting a new one: %s" % (manifest_location, str(e)))
+
+    # Manifests before v1.10 were a single JSON document, carry them over once
+    elif legacy_location and os.path.isfile(legacy_location):
+        try:
+            with open(legacy_location) as f:
+                legacy = json.load(f)
+            manifest["paths"] = dict([(path, [times[0], None]) for path, times in legacy.get("paths", {}).items()])
+            manifest["directories"] = legacy.get("directories", {})
+            manifest["rewrite"] = True
+        except (OSError, ValueError) as e:
+            print ("[ Collect Media ] WARNING: Could not read manifest %s, starting a new one: %s" % (legacy_location, str(e)))
+
+    return manifest
+
+def update_manifest(manifest, file_list, dir_index, now):
+    """
+    Mark every collected path as seen and prune the paths and directories this run didn't
+    see, so deleted media doesn't stay in the manifest forever. Returns the new paths, the
+    pruned paths and the records to add to the manifest file.
+    """
+
+    paths = manifest["paths"]
+    new_paths = []
+    records = []
+
+    for path in file_list:
+        times = paths.get(path)
+        if times:
+            times[1] = now
+        else:
+            paths[path] = [now, now]
+            new_paths.append(path)
+            records.append({"path": path, "first_seen": now})
+
+    pruned_paths = [path for path, times in paths.items() if times[1] != now]
+    for path in pruned_paths:
+        del paths[path]
+        records.append({"removed_path": path})
+
+    # Only directories whose listing changed need a new record
+    directories = manifest["directories"]
+    for directory, listing in dir_index.directory_mtimes.items():
+        if directories.get(directory) != listing:
+            directories[directory] = listing
+            records.append({"directory": directory, "mtime": listing[0], "names": listing[1]})
+
+    for directory in [directory for directory in directories if directory not in dir_index.directory_mtimes]:
+        del directories[directory]
+        records.append({"removed_directory": directory})
+
+    return new_paths, pruned_paths, records
+
+def save_manifest(manifest_location, manifest, records):
+    import json
+
+    # Runs only append their changes. Once most of the file is replaced or removed
+    # records, it's rewritten with one record per live path and directory.
+    live = len(manifest["paths"]) + len(manifest["directories"])
+    total = manifest["records"] + len(records)
+
+    if manifest["rewrite"] or total > 2 * live + manifest_slack:
+        with atomic_write(manifest_location) as f:
+            for path, times in manifest["paths"].items():
+                f.write(json.dumps({"path": path, "first_seen": times[0]}, separators=(",", ":")) + "\n")
+            for directory, listing in manifest["directories"].items():
+                f.write(json.dumps({"directory": directory, "mtime": listing[0], "names": listing[1]}, separators=(",", ":")) + "\n")
+        manifest["records"] = live
+        manifest["rewrite"] = False
+
+    elif records:
+        with open(manifest_location, "a") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        manifest["records"] = total
+
+#
+# Compact List Functions
+#
+
+def frame_ranges(frames):
+    # Collapse a sorted list of frame numbers to [start, end] ranges and the holes between them
+    ranges = []
+    holes = []
+
+    for frame in frames:
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            if ranges:
+                holes.append([ranges[-1][1] + 1, frame - 1])
+            ranges.append([frame, frame])
+
+    return ranges, holes
+
+def format_ranges(ranges):
+    return ",".join([str(start) if start == end else "%i-%i" % (start, end) for start, end in ranges])
+
+def build_compact_records(file_list):
+    # Returns the records and the number of unique paths they hold
+    sequences = {}
+    singles = set()
+
+    for path in file_list:
+        directory, name = os.path.split(path)
+        match = DirectoryIndex.sequence_pattern.match(name)
+        if match:
+            prefix, frame, ext = match.groups()
+            sequences.setdefault((directory, prefix, len(frame), ext), set()).add(int(frame))
+        else:
+            # Movies without a number, stills, audio and Red folders are kept as-is with no padding
+            singles.add((directory, name, 0, "", "", ""))
+
+    records = list(singles)
+    count = len(singles)
+
+    for (directory, prefix, padding, ext), frames in sequences.items():
+        ranges, holes = frame_ranges(sorted(frames))
+        records.append((directory, prefix, padding, ext, format_ranges(ranges), format_ranges(holes)))
+        count += len(frames)
+
+    return sorted(records), count
+
+def write_compact_list(file_list, location):
+    # One tab separated record per sequence: directory, prefix, padding, extension, frame ranges, holes.
+    # Returns the number of paths the records hold.
+    records, count = build_compact_records(file_list)
+
+    with atomic_write(location) as f:
+        f.write("# collect_media ranges v1\n")
+        for record in records:
+            f.write("\t".join([str(field) for field in record]) + "\n")
+
+    return count
+
+def expand_compact_list(location):
+    # Stream every path back out of a compact list without holding it in memory
+    with open(location) as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+
+            directory, prefix, padding, ext, ranges, holes = line.split("\t")
+            padding = int(padding)
+
+            if not padding:
+                yield os.path.join(directory, prefix)
+                continue
+
+            for chunk in ranges.split(","):
+                start, _, end = chunk.partition("-")
+                for frame in range(int(start), int(end or start) + 1):
+                    yield os.path.join(directory, "%s%0*d%s" % (prefix, padding, frame, ext))
+
+def read_dump_file(location):
+    if compact_output:
+        for path in expand_compact_list(location):
+            yield path
+    else:
+        with open(location) as f:
+            for line in f:
+                if line.rstrip():
+                    yield line.rstrip()
+
 #
 # Extration Fuctions
 #
@@ -276,16 +957,12 @@ def extract_segment_info(segment):
                 if path and path != '':
                     return path
 
-def get_file_sequence(filepath):
-    import os
-    import re
-    import glob
-
+def get_file_sequence(filepath, dir_index):
     exlude_list = ["mp4", "mov", "mxf", "braw", "r3d"]
     sequence = []
     ext = filepath.split(".")[-1].lower()
     if ext in exlude_list:
-        if os.path.isfile(filepath):
+        if dir_index.is_file(filepath):
 
             # Make an exception for Red. Send path instead with trailing slash
             if ext == "r3d":
@@ -293,64 +970,248 @@ def get_file_sequence(filepath):
 
             sequence.append(filepath)
     else:
-        try:
-            first_frame_number = re.findall(r'\d+', filepath)[-1]
-            padding = len(first_frame_number)
-            question_marks = ''.join([char*padding for char in "?"])
-            # sanitises filepath incase someone put brackets in the name
-            sanatised_filepath = glob.escape(filepath)
-            glob_to_search = sanatised_filepath.replace(str(first_frame_number) + "." + ext, question_marks + "." + ext)
-            if os.path.isfile(filepath):
-                sequence = glob.glob(glob_to_search)
-        except:
-            if os.path.isfile(filepath):
-                sequence.append(filepath)
+        sequence = dir_index.sequence(filepath)
 
     if sequence:
         return sorted(sequence)
 
+def resolve_file_sequences(paths, dir_index, workers):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Paths are already unique, each one only needs to be resolved once
+    resolved = []
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for frames in pool.map(lambda path: get_file_sequence(path, dir_index), paths):
+            if frames:
+                resolved.append(frames)
+
+    return resolved
+
 #
-# Scrape Workspace
+# Report Functions
 #
 
-def scrape_workspace():
+def sequence_report_row(frames, dir_index):
+    first = frames[0]
 
-    global clips
-    global sequences
+    # Red clips come through as their folder, size up everything in it
+    if first.endswith("/"):
+        files = dir_index.listing(first.rstrip("/"))[0]
+        size = sum([dir_index.size(os.path.join(first, name)) for name in files])
+        return [first, "", "", len(files), 0, "", size]
 
-    workspace = flame.project.current_project.current_workspace
-    desktop = workspace.desktop
+    size = sum([dir_index.size(path) for path in frames])
 
-    print ("[ Collect Media ] + Scraping Workspace:", workspace.name.get_value())
+    directory, name = os.path.split(first)
+    match = DirectoryIndex.sequence_pattern.match(name)
+    if not match:
+        return [first, "", "", 1, 0, "", size]
 
-    # Go through every library in the current workspace
-    for library in workspace.libraries:
-        lib_name = library.name.get_value()
+    prefix, frame, ext = match.groups()
+    numbers = sorted([int(DirectoryIndex.sequence_pattern.match(os.path.basename(path)).group(2)) for path in frames])
+    holes = frame_ranges(numbers)[1]
+    missing = sum([end - start + 1 for start, end in holes])
+    pattern = os.path.join(directory, prefix + "#" * len(frame) + ext)
 
-        # Skip these two libraries
-        if lib_name == "Timeline FX" or lib_name == "Grabbed References":
-            pass
+    return [pattern, numbers[0], numbers[-1], len(numbers), missing, format_ranges(holes), size]
+
+def build_sequence_report(sequences, dir_index, workers):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Several clips can point at the same sequence, only report it once
+    unique_sequences = list(dict([(frames[0], frames) for frames in sequences]).values())
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rows = list(pool.map(lambda frames: sequence_report_row(frames, dir_index), unique_sequences))
+
+    return sorted(rows, key=lambda row: row[0])
+
+def write_sequence_report(rows, location):
+    import csv
+
+    with atomic_write(location, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sequence", "first_frame", "last_frame", "frames", "missing_frames", "holes", "bytes"])
+        writer.writerows(rows)
+
+def format_size(size):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size < 1024 or unit == "TB":
+            break
+        size /= 1024.0
+    return "%.2f %s" % (size, unit)
+
+#
+# Checksum Functions
+#
+
+def checksum_algorithm():
+    # xxhash is much faster but isn't shipped with Flame's Python
+    try:
+        import xxhash
+        return "xxh3_128"
+    except ImportError:
+        return "blake2b"
+
+def new_hasher(algorithm):
+    import hashlib
+
+    if algorithm == "xxh3_128":
+        import xxhash
+        return xxhash.xxh3_128()
+
+    return hashlib.blake2b()
+
+def checksum_file(path, algorithm, chunk_size):
+    hasher = new_hasher(algorithm)
+
+    # Read in chunks so large movies never have to fit in memory
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+
+    return hasher.hexdigest()
+
+def load_checksums(location, algorithm):
+    checksums = {}
+
+    if os.path.isfile(location):
+        with open(location) as f:
+            header = f.readline().split()
+
+            # Checksums from a different algorithm can't be reused
+            if header[-1:] != [algorithm]:
+                return checksums
+
+            # Lines cut short by an interrupted run are skipped, those files are simply hashed again
+            skipped = 0
+            for line in f:
+                try:
+                    digest, size, mtime, path = line.rstrip("\n").split("\t", 3)
+                    checksums[path] = (digest, int(size), int(mtime))
+                except ValueError:
+                    skipped += 1
+
+            if skipped:
+                print ("[ Collect Media ] WARNING: Skipped %i malformed lines in %s" % (skipped, location))
+
+    return checksums
+
+def checksum_entry(path, previous, algorithm, chunk_size):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    # Unchanged since the last run, reuse the previous checksum
+    known = previous.get(path)
+    if known and known[1] == stat.st_size and known[2] == stat.st_mtime_ns:
+        return known[0], stat.st_size, stat.st_mtime_ns, path, True
+
+    try:
+        digest = checksum_file(path, algorithm, chunk_size)
+    except OSError:
+        return None
+
+    return digest, stat.st_size, stat.st_mtime_ns, path, False
+
+def expand_checksum_paths(paths):
+    for path in paths:
+
+        # Red clips are collected as their folder, checksum every file in it
+        if path.endswith("/"):
+            try:
+                names = sorted(os.listdir(path))
+            except OSError:
+                names = []
+
+            for name in names:
+                if os.path.isfile(os.path.join(path, name)):
+                    yield os.path.join(path, name)
         else:
-            print ("[ Collect Media ] +-> Scraping Library:", lib_name)
+            yield path
+
+def write_checksums(paths, location, workers, chunk_size, batch_size=checksum_batch_size):
+    from concurrent.futures import ThreadPoolExecutor
+
+    start = time.time()
+    algorithm = checksum_algorithm()
+    previous = load_checksums(location, algorithm)
+
+    hashed = 0
+    hashed_bytes = 0
+    reused = 0
+    missing = 0
+
+    # hashlib and xxhash release the GIL while hashing so threads are enough here
+    # and we avoid forking a whole Flame process for a process pool.
+    with atomic_write(location) as f, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        f.write("# collect_media checksums %s\n" % algorithm)
+
+        # Feed the pool a batch at a time so only one batch of futures and results is ever held,
+        # however many frames are collected. Each batch is written out before the next starts.
+        paths = expand_checksum_paths(paths)
+        while True:
+            batch = list(itertools.islice(paths, max(1, batch_size)))
+            if not batch:
+                break
+
+            for entry in pool.map(lambda path: checksum_entry(path, previous, algorithm, chunk_size), batch):
+                if entry is None:
+                    missing += 1
+                    continue
+
+                digest, size, mtime, path, was_reused = entry
+                f.write("%s\t%i\t%i\t%s\n" % (digest, size, mtime, path))
+
+                if was_reused:
+                    reused += 1
+                else:
+                    hashed += 1
+                    hashed_bytes += size
+
+    print ("[ Collect Media ] Checksums (%s): hashed %i files (%s), reused %i, %i missing, took %.2f seconds"
+           % (algorithm, hashed, format_size(hashed_bytes), reused, missing, time.time() - start))
 
-            build_list_folder(library.folders)
-            build_list_reels(library.reels)
-            build_list_reel_group(library.reel_groups)
-            build_list_batchgroups(library.batch_groups)
-            build_list_desktop(library.desktops)
-            build_list_lose_clips(library.clips)
-            build_list_lose_sequence(library.sequences)
+#
+# Scrape Workspace
+#
 
-    print ("[ Collect Media ] +-> Scraping Desktop:", desktop.name.get_value())
-    
-    # Unable to just send the current desktop to build_list_desktop so we have to
-    # break it down beforehand to reel groups and batch groups
-    
-    if (desktop.reel_groups):
-        build_list_reel_group(desktop.reel_groups)
+def project_workspaces(project):
+    # Not every Flame version exposes the workspaces of a project
+    workspaces = [workspace for workspace in getattr(project, "workspaces", None) or [] if workspace]
+
+    if not workspaces:
+        print ("[ Collect Media ] WARNING: This version of Flame only exposes the current workspace")
+        workspaces = [project.current_workspace]
+
+    return workspaces
+
+def scrape_workspace(workspace, opened_iterations, stats):
+
+    clips = []
+    sequences = []
 
-    if (desktop.batch_groups):
-        build_list_batchgroups(desktop.batch_groups)
+    print ("[ Collect Media ] + Scraping Workspace:", workspace.name.get_value())
+
+    # Go through every library in the workspace followed by the current desktop
+    for kind, container_path, item in walk_workspace(workspace, all_batch_iterations, opened_iterations):
+        stats.count("objects_walked")
+
+        if kind == "library":
+            print ("[ Collect Media ] +-> Scraping Library:", container_path)
+        elif kind == "current_desktop":
+            print ("[ Collect Media ] +-> Scraping Desktop:", container_path)
+        elif kind == "batch_iteration":
+            print ("[ Collect Media ] +-> Scraping Batch Iteration:", container_path)
+        elif kind == "clip":
+            clips.append(item)
+        elif kind == "sequence":
+            sequences.append(item)
 
     return clips, sequences
 
@@ -361,16 +1222,14 @@ def scrape_workspace():
 
 # def collect_media(selection):
 def collect_media():
-    import os
-    import time
     import shutil
 
     debug = False
 
     global uncached_only
+    global incremental
 
     current_project = flame.project.current_project.name
-    file_list = []
 
     # Custom dumpfile location in case you want a shared location.
     # This will still create a sub-folder for the current_project.
@@ -378,7 +1237,10 @@ def collect_media():
     custom_dump_location = ""
 
     # Setup the dump the file and deal with locking
-    dump_file = "collected_media.txt"
+    if compact_output:
+        dump_file = "collected_media.ranges"
+    else:
+        dump_file = "collected_media.txt"
 
     if custom_dump_location:
         dump_file_location = os.path.join(custom_dump_location, current_project, dump_file)
@@ -401,190 +1263,339 @@ def collect_media():
     
     # Make sure someone else isn't writting to the file. If they aren't, then do our thing.
     locked_dump_file_location = dump_file_location + ".lock"
-    if os.path.isfile(locked_dump_file_location):
+    lock_fd = acquire_lock(locked_dump_file_location)
+    if lock_fd is None:
         print ("\n\n[ Collect Media ] ERROR: Someone else is writing to the list. Exiting.\n\n")
     else:
+        try:
+            print ("\n\n[ Collect Media ] Starting ...")
+            if all_workspaces:
+                print ("[ Collect Media ] IMPORTANT: Scraping every workspace in the project")
+            else:
+                print ("[ Collect Media ] IMPORTANT: Only works on the current workspace")
 
-        print ("\n\n[ Collect Media ] Starting ...")
-        print ("[ Collect Media ] IMPORTANT: Only works on the current workspace")
+            if all_batch_iterations:
+                print ("[ Collect Media ] IMPORTANT: Scraping every batch iteration")
 
-        if uncached_only:
-            print ("[ Collect Media ] IMPORTANT: Searching for uncached media only")
-        else:
-            print ("[ Collect Media ] IMPORTANT: Searching for all media regardless of cache status")
+            if uncached_only:
+                print ("[ Collect Media ] IMPORTANT: Searching for uncached media only")
+            else:
+                print ("[ Collect Media ] IMPORTANT: Searching for all media regardless of cache status")
+
+            # Incremental mode keeps track of what we already have in the manifest
+            manifest = None
+            if incremental:
+                manifest_location = os.path.splitext(dump_file_location)[0] + ".manifest.jsonl"
+                legacy_manifest_location = os.path.splitext(dump_file_location)[0] + ".manifest.json"
+                manifest = load_manifest(manifest_location, legacy_manifest_location)
+
+                print ("[ Collect Media ] IMPORTANT: Incremental mode, %i paths already in manifest" % len(manifest["paths"]))
+
+                # First incremental run over an existing list, seed the manifest from it
+                if os.path.isfile(dump_file_location) and not manifest["paths"]:
+                    now = int(time.time())
+                    for path in read_dump_file(dump_file_location):
+                        manifest["paths"][path] = [now, None]
+                    manifest["rewrite"] = True
+
+            # See if an existing dump file is there, if it is then make a backup of the previous list.
+            # Its contents are merged back in while the new list is written.
+            elif os.path.isfile(dump_file_location):
+
+                # Get timestamp
+                t = time.time()
+                timestamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(t))
+
+                # Append . so we can just use replace to create the full path easily.
+                timestamp = ".bu_" + timestamp
+                dump_file_backup = os.path.splitext(dump_file_location)[0] + timestamp
+
+                # Make a backup of the list
+                shutil.copyfile(dump_file_location, dump_file_backup)
+        
+            stats = RunStats()
+            run_start = time.time()
 
-        # See if an existing dump file is there, if it is then load those contents into our file list
-        # and make a backup of the previous list.
-        if os.path.isfile(dump_file_location):
+            # Scrape workspaces
+            project = flame.project.current_project
+            if all_workspaces:
+                workspaces = project_workspaces(project)
+            else:
+                workspaces = [project.current_workspace]
 
-            # Get timestamp
-            t = time.time()
-            timestamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(t))
+            collected_clips = set()
+            collected_sequences = set()
+            opened_iterations = []
 
-            # Append . so we can just use replace to create the full path easily.
-            timestamp = ".bu_" + timestamp
-            dump_file_backup = dump_file_location.replace(".txt", timestamp)
+            # The batch groups opened for previous iterations are removed even if scraping fails
+            try:
+                with stats.phase("api_traversal"):
+                    for workspace in workspaces:
+                        scraped = scrape_workspace(workspace, opened_iterations, stats)
+                        collected_clips.update(scraped[0])
+                        collected_sequences.update(scraped[1])
+
+                # One listing per directory for the whole run
+                if incremental:
+                    dir_index = DirectoryIndex(manifest["directories"], record_sizes=sequence_report)
+                else:
+                    dir_index = DirectoryIndex(record_sizes=sequence_report)
+
+                # Paths gathered from the Flame API, resolved on disk afterwards. Kept in a dict
+                # so each path is only held and resolved once, in the order it was found.
+                candidate_paths = {}
+                audio_paths = []
+
+                # Clips
+                num_clips = 0
+                num_audio = 0
+
+                print ("[ Collect Media ] Extracting clips and paths, this may take a while...")
+
+                start = time.time()
+                for clips in collected_clips:
+                    if clips:
+                        stats.count("clips_visited")
+
+                        with stats.phase("clip_extraction"):
+                            extracted = extract_clip_info(clips)
+                            if extracted:
+                                num_clips += 1
+                                candidate_paths[extracted] = None
+
+                        # Lose Audio clips
+                        with stats.phase("audio_collection"):
+                            if clips.audio_tracks:
+
+                                # Only find uncached clips
+                                if uncached_only:
+                                    if clips.cached == "Uncached":
+                                        for track in clips.audio_tracks:
+                                            for channel in track.channels:
+                                                for audio in channel.segments:
+                                                    num_audio += 1
+                                                    stats.count("audio_segments_visited")
+                                                    audio_paths.append(audio.file_path)
+                                # Grab everything
+                                else:
+                                    for track in clips.audio_tracks:
+                                        for channel in track.channels:
+                                            for audio in channel.segments:
+                                                num_audio += 1
+                                                stats.count("audio_segments_visited")
+                                                audio_paths.append(audio.file_path)
+
+                print("[ Collect Media ] Took %.2f seconds" % (time.time() - start))
+
+                if uncached_only:
+                    print ("[ Collect Media ] Found %i uncached, lose video clips" % num_clips)
+                    print ("[ Collect Media ] Found %i uncached, lose audio tracks" % num_audio)
+                else:
+                    print ("[ Collect Media ] Found %i lose video clips" % num_clips)
+                    print ("[ Collect Media ] Found %i lose audio tracks" % num_audio)
+
+                print ("[ Collect Media ] Extracting segments and paths, this may take a while...")
+
+                # Sequences
+                uniq_segments = set()
+
+                start = time.time()
+                for sequence in collected_sequences:
+                    if sequence:
+                        stats.count("sequences_visited")
+
+                        with stats.phase("segment_extraction"):
+                            if debug:
+                                print ("Sequence Pointer: " ,sequence)
+                                print ("Sequence Type:", sequence.type)
+                                print ("Sequence: ", sequence.name)
+                                print ("    <-- ", sequence.parent.name)
+                                print ("        <-- ", sequence.parent.parent.name)
+                                print ("           <-- ", sequence.parent.parent.parent.name)
+                                print ("              <-- ", sequence.parent.parent.parent.parent.name)
+                
+                            segments_list = segments_in_sequence(sequence)
+               
+                            if debug:
+                                print ("Segment list: ", segments_list)
+
+                            if segments_list:
+                                for segment in segments_list:
+                                    if debug:
+                                        print ("        Segment: ", segment.name)
+                                        print ("        Segment Parent:", segment.parent.parent.name)
+                                    if segment:
+                                        stats.count("segments_visited")
+                                        extracted = extract_segment_info(segment)
+                                        if extracted:
+                                            uniq_segments.add(extracted)
+                                            candidate_paths[extracted] = None
+
+                        # Audio in sequences
+                        with stats.phase("audio_collection"):
+                            if sequence.audio_tracks:
+                                for track in sequence.audio_tracks:
+                                    if track:
+                                        for channel in track.channels:
+                                            for audio in channel.segments:
+                                                if audio:
+                                                    stats.count("audio_segments_visited")
+
+                                                    # Only find uncached clips
+                                                    if uncached_only:
+                                                        if audio.source_cached == "Uncached" and audio.file_path != '':
+                                                            audio_paths.append(audio.file_path)
+
+                                                    # Grab everything
+                                                    else:
+                                                        if audio.file_path and audio.file_path != '':
+                                                            audio_paths.append(audio.file_path)
+
+            # All paths are extracted, remove the batch groups we opened for previous iterations
+            finally:
+                remove_opened_iterations(opened_iterations)
+
+            print("[ Collect Media ] Took %.2f seconds" % (time.time() - start))
 
-            # Make a backup of the list
-            shutil.copyfile(dump_file_location, dump_file_backup)
+            if uncached_only:
+                print ("[ Collect Media ] Found %i total sequences with %i unique, uncached video clips" % (len(collected_sequences), len(uniq_segments)))
+            else:
+                print ("[ Collect Media ] Found %i total sequences with %i unique video clips" % (len(collected_sequences), len(uniq_segments)))
 
-            # Rename to lock file
-            os.rename(dump_file_location, locked_dump_file_location)
-            
-            with open(locked_dump_file_location) as f:
-                for line in f:
-                    file_list.append(line.rstrip())
-        
-        # Scrape workspace
-        scraped = scrape_workspace()
-        collected_clips = set(scraped[0])
-        collected_sequences = set(scraped[1])
+            # Resolve every collected path on disk
+            print ("[ Collect Media ] Resolving %i paths on disk using %i threads..." % (len(candidate_paths), resolve_workers))
 
-        # Clips
-        num_clips = 0
-        num_audio = 0
+            start = time.time()
+            with stats.phase("filesystem_resolution"):
+                resolved_sequences = resolve_file_sequences(candidate_paths, dir_index, resolve_workers)
 
-        print ("[ Collect Media ] Extracting clips and paths, this may take a while...")
+            # Every resolved frame and audio path, streamed from the sequences instead of copied into another list
+            def collected_paths():
+                return itertools.chain(itertools.chain.from_iterable(resolved_sequences), audio_paths)
 
-        start = time.time()
-        for clips in collected_clips:
-            if clips:
-                extracted = extract_clip_info(clips)
-                if extracted:
-                    num_clips += 1
-                    frames = get_file_sequence(extracted)
-                    if frames:
-                        for frame in frames:
-                            file_list.append(frame)
-                
-                # Lose Audio clips
-                if clips.audio_tracks:
-
-                    # Only find uncached clips
-                    if uncached_only:
-                        if clips.cached == "Uncached":
-                            for track in clips.audio_tracks:
-                                for channel in track.channels:
-                                    for audio in channel.segments:
-                                        num_audio += 1
-                                        file_list.append(audio.file_path)
-                    # Grab everything
+            print("[ Collect Media ] Took %.2f seconds" % (time.time() - start))
+            print(dir_index.summary())
+
+            if sequence_report:
+                report_location = os.path.splitext(dump_file_location)[0] + ".report.csv"
+
+                # Audio is reported as single files
+                audio_sequences = [[path] for path in dict.fromkeys(audio_paths) if path]
+                with stats.phase("sequence_report"):
+                    report = build_sequence_report(resolved_sequences + audio_sequences, dir_index, resolve_workers)
+                    write_sequence_report(report, report_location)
+
+                print ("[ Collect Media ] Report: %i sequences, %i frames, %i missing frames, %s"
+                       % (len(report), sum([row[3] for row in report]), sum([row[4] for row in report]), format_size(sum([row[6] for row in report]))))
+                print ("[ Collect Media ] Created sequence report: ", report_location)
+
+            with stats.phase("write_out"):
+                if incremental:
+                    new_paths, pruned_paths, records = update_manifest(manifest, collected_paths(), dir_index, int(time.time()))
+
+                    print ("[ Collect Media ] Appending %i new paths to the list" % len(new_paths))
+                    if pruned_paths:
+                        print ("[ Collect Media ] Pruning %i paths that weren't found this run" % len(pruned_paths))
+
+                    # The compact list is small enough to rebuild from the manifest every time
+                    if compact_output:
+                        write_compact_list(manifest["paths"], dump_file_location)
+
+                    # Pruned paths have to come out of the list, so it's rewritten from the manifest
+                    elif pruned_paths:
+                        write_sorted_list(manifest["paths"], dump_file_location, sort_chunk_size)
+
+                    # Append to the dump file
+                    elif new_paths:
+                        append_to_list(sorted(new_paths), dump_file_location)
+
+                    save_manifest(manifest_location, manifest, records)
+
+                    # The old single document manifest has been carried over
+                    if os.path.isfile(legacy_manifest_location):
+                        os.remove(legacy_manifest_location)
+                    paths_in_list = len(manifest["paths"])
+
+                else:
+                    print ("[ Collect Media ] Writing list of files")
+
+                    # Merge the previous list back in straight from disk
+                    if os.path.isfile(dump_file_location):
+                        all_paths = itertools.chain(read_dump_file(dump_file_location), collected_paths())
                     else:
-                        for track in clips.audio_tracks:
-                            for channel in track.channels:
-                                for audio in channel.segments:
-                                    num_audio += 1
-                                    file_list.append(audio.file_path)
+                        all_paths = collected_paths()
 
-        print("[ Collect Media ] Took %.2f seconds" % (time.time() - start))
+                    if compact_output:
+                        paths_in_list = write_compact_list(all_paths, dump_file_location)
 
-        if uncached_only:
-            print ("[ Collect Media ] Found %i uncached, lose video clips" % num_clips)
-            print ("[ Collect Media ] Found %i uncached, lose audio tracks" % num_audio)
-        else:
-            print ("[ Collect Media ] Found %i lose video clips" % num_clips)
-            print ("[ Collect Media ] Found %i lose audio tracks" % num_audio)
+                    # Sort, de-duplicate and write the list without holding extra copies of it
+                    else:
+                        paths_in_list = write_sorted_list(all_paths, dump_file_location, sort_chunk_size)
 
-        print ("[ Collect Media ] Extracting segments and paths, this may take a while...")
+            if checksum_files:
+                checksum_location = os.path.splitext(dump_file_location)[0] + ".checksums"
 
-        # Sequences
-        uniq_segments = []
+                print ("[ Collect Media ] Calculating checksums using %i threads, this may take a while..." % checksum_workers)
 
-        start = time.time()
-        for sequence in collected_sequences:
-            if sequence:
-                if debug:
-                    print ("Sequence Pointer: " ,sequence)
-                    print ("Sequence Type:", sequence.type)
-                    print ("Sequence: ", sequence.name)
-                    print ("    <-- ", sequence.parent.name)
-                    print ("        <-- ", sequence.parent.parent.name)
-                    print ("           <-- ", sequence.parent.parent.parent.name)
-                    print ("              <-- ", sequence.parent.parent.parent.parent.name)
-                
-                segments_list = segments_in_sequence(sequence)
-               
-                if debug:
-                    print ("Segment list: ", segments_list)
-
-                if segments_list:
-                    for segment in segments_list:
-                        if debug:
-                            print ("        Segment: ", segment.name)
-                            print ("        Segment Parent:", segment.parent.parent.name)
-                        if segment:
-                            extracted = extract_segment_info(segment)
-                            if extracted:
-                                uniq_segments.append(extracted)
-                                frames = get_file_sequence(extracted)
-                                if frames:
-                                    for frame in frames:
-                                        file_list.append(frame)
-                
-                # Audio in sequences
-                if sequence.audio_tracks:
-                    for track in sequence.audio_tracks:
-                        if track:
-                            for channel in track.channels:
-                                for audio in channel.segments:
-                                    if audio:
-
-                                        # Only find uncached clips
-                                        if uncached_only:
-                                            if audio.source_cached == "Uncached" and audio.file_path != '':
-                                                file_list.append(audio.file_path)
-
-                                        # Grab everything
-                                        else:
-                                            if audio.file_path and audio.file_path != '':
-                                                file_list.append(audio.file_path)
-
-        # Remove duplicates and sort list
-        file_list_cleaned = sorted(set(file_list))
-
-        print("[ Collect Media ] Took %.2f seconds" % (time.time() - start))
-
-        if uncached_only:
-            print ("[ Collect Media ] Found %i total sequences with %i unique, uncached video clips" % (len(collected_sequences), len(set(uniq_segments))))
-        else:
-            print ("[ Collect Media ] Found %i total sequences with %i unique video clips" % (len(collected_sequences), len(set(uniq_segments))))
+                with stats.phase("checksums"):
+                    write_checksums(read_dump_file(dump_file_location), checksum_location, checksum_workers, checksum_chunk_size)
 
-        print ("[ Collect Media ] Writing list of files")
+                print ("[ Collect Media ] Created checksums: ", checksum_location)
 
+            if run_stats:
+                stats_location = os.path.splitext(dump_file_location)[0] + ".stats.jsonl"
 
-        # Write contents of file_list to locked dump file, overwritting existing data since we already have that
-        f = open(locked_dump_file_location, "w")
+                counters = dir_index.counters()
+                counters["paths_in_list"] = paths_in_list
+                for name, amount in counters.items():
+                    stats.count(name, amount)
 
-        # Create a long string to allow us to just write to the file in one go.
-        file_list_string = '\n'.join(file_list_cleaned)
-        f.write(file_list_string)
-        f.close()
+                record = stats.record(
+                    project=current_project,
+                    workspaces=[workspace.name.get_value() for workspace in workspaces],
+                    started=time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(run_start)),
+                    total_seconds=round(time.time() - run_start, 4),
+                    uncached_only=uncached_only,
+                    incremental=incremental,
+                    resolve_workers=resolve_workers,
+                )
+                write_run_stats(record, stats_location)
 
-        # Rename to the non-locked file
-        os.rename(locked_dump_file_location, dump_file_location)
+                print ("[ Collect Media ] Phases: %s" % ", ".join(["%s %.2fs" % (name, seconds) for name, seconds in sorted(record["phases"].items())]))
+                print ("[ Collect Media ] Appended run stats to: ", stats_location)
 
-        print ("[ Collect Media ] Created list for archive: ", dump_file_location)
-        print ("[ Collect Media ] Rsync Command: rsync -avh --progress --files-from=%s / /path/to/backup/" % (dump_file_location))
-        print ("[ Collect Media ] Finished\n\n")
+            # The compact list is expanded on the fly and piped into rsync
+            if compact_output:
+                rsync_command = "python3 %s %s | rsync -avh --progress --files-from=- / /path/to/backup/" % (os.path.abspath(__file__), dump_file_location)
+            else:
+                rsync_command = "rsync -avh --progress --files-from=%s / /path/to/backup/" % (dump_file_location)
 
-        flame.messages.show_in_console(
-            "[ Collect Media ] Rsync Command: rsync -avh --progress --files-from=%s / /path/to/backup/" % (dump_file_location), "info", 10
-        )
+            print ("[ Collect Media ] Created list for archive: ", dump_file_location)
+            print ("[ Collect Media ] Rsync Command: %s" % (rsync_command))
+            print ("[ Collect Media ] Finished\n\n")
 
-        # Let's give the user a pretty info message
-        dialog = flame.messages.show_in_dialog(
-            title ="Collect Media (v1.0)",
-            message = "Scraping complete.\n\nProgress and final archive command are in the console.",
-            type = "info",
-            buttons = ["Close"])
+            flame.messages.show_in_console(
+                "[ Collect Media ] Rsync Command: %s" % (rsync_command), "info", 10
+            )
 
-        if dialog == "Close":
-            pass
+            # Let's give the user a pretty info message
+            dialog = flame.messages.show_in_dialog(
+                title ="Collect Media (v1.10)",
+                message = "Scraping complete.\n\nProgress and final archive command are in the console.",
+                type = "info",
+                buttons = ["Close"])
+
+            if dialog == "Close":
+                pass
+
+        # Always give the lock back, even if something went wrong
+        finally:
+            release_lock(lock_fd, locked_dump_file_location)
 
 
 def show_message(selection):
     dialog = flame.messages.show_in_dialog(
-        title ="Collect Media (v1.0)",
+        title ="Collect Media (v1.10)",
         message = "IMPORT: Only works on the current workspace. Please select if you want to only search for uncached media or everything.\n\nProgress and final archive command are in the console.",
         type = "warning",
         buttons = ["Everything", "Uncached Only"],
@@ -617,3 +1628,11 @@ def get_main_menu_custom_ui_actions():
     ]
 
 get_main_menu_custom_ui_actions.minimum_version = "2023.1"
+
+# Expand a compact list for rsync from the command line:
+# python3 collect_media.py collected_media.ranges | rsync -avh --progress --files-from=- / /path/to/backup/
+if __name__ == "__main__":
+    import sys
+
+    for path in expand_compact_list(sys.argv[1]):
+        sys.stdout.write(path + "\n")
@@ -19,11 +19,11 @@
 
 """
 Script Name:    ffmpeg Transcode
-Script Version: v1.0.0
+Script Version: v1.5.0
 Flame Version:  2025.1
 Written by:     Kyle Obley
 Creation Date:  06.30.26
-Update Date:    06.30.26
+Update Date:    18.10.26
 
 License:        GNU General Public License v3.0 (GPL-3.0) - see LICENSE file for details
 
@@ -43,6 +43,39 @@ To install:
 
 Updates:
 
+    v1.5.0 18.10.26
+        - Added a Backburner background mode. Each transcode is sent to the farm as a cmdjob so
+          the workstation is free. With SEGMENT_SECONDS set, long sources are split into
+          segment jobs and a concat job (ffmpeg -f concat) that depends on them joins the
+          segments. Set BACKBURNER_LOCAL to run the same jobs on this machine without Backburner.
+        - Background jobs are given BACKBURNER_TIMEOUT (a day) instead of cmdjob's 10 minute
+          timeout, which killed the encode of any long source sent as one job.
+        - Background jobs are probed and submitted on a worker thread, so a large batch doesn't
+          freeze Flame while cmdjob runs.
+
+    v1.4.0 18.10.26
+        - Added output presets. A preset makes several deliverables (bitrate, scale and append
+          name per output) from a single ffmpeg run. The source is decoded once and split to
+          each encode, so 4K ProRes is only decoded once instead of once per deliverable.
+          Presets are set in OUTPUT_PRESETS.
+
+    v1.3.0 18.10.26
+        - Outputs that are already up to date are skipped. Each destination folder keeps a
+          manifest (.ffmpeg_transcode_cache.json) of the source path, size and modification time
+          and the encode settings behind every output. Re-running on a folder only encodes the
+          clips that changed. Turn off Skip Up To Date to encode everything again.
+
+    v1.2.0 18.10.26
+        - ffmpeg now reports through -progress instead of printing every line to the console.
+          A progress window shows each file's percentage, fps, speed and ETA, plus the overall
+          progress and ETA for the whole batch. The console only gets start, finish and failure
+          messages, with the last lines of ffmpeg's log when a transcode fails.
+
+    v1.1.0 18.10.26
+        - Transcodes now run in a background queue, several ffmpeg processes at a time, so Flame
+          stays responsive. The number of jobs is set by MAX_JOBS, or worked out from the number
+          of cores divided by X264_THREADS. Each job reports its progress and return code.
+
     v1.0.0 06.30.26
         - Initial release.
 """
@@ -52,7 +85,17 @@ Updates:
 # ==============================================================================
 
 import os
+import re
+import json
+import math
+import time
+import queue
+import shlex
+import hashlib
+import itertools
+import collections
 import flame
+import threading
 import subprocess
 from lib.pyflame_lib_ffmpeg_transcode import *
 
@@ -61,9 +104,574 @@ from lib.pyflame_lib_ffmpeg_transcode import *
 # ==============================================================================
 
 SCRIPT_NAME    = 'ffmpeg Transcode'
-SCRIPT_VERSION = 'v1.0.0'
+SCRIPT_VERSION = 'v1.5.0'
 SCRIPT_PATH    = os.path.abspath(os.path.dirname(__file__))
 
+# Number of ffmpeg processes to run at once. 0 works it out from the number of
+# cores divided by the threads each x264 encode is given.
+MAX_JOBS       = 0
+X264_THREADS   = 4
+
+# How often the progress window is refreshed (ms) and how many lines of each
+# ffmpeg log are kept to report failures.
+PROGRESS_INTERVAL = 500
+LOG_LINES         = 20
+
+# Written to each destination folder to remember what has been transcoded there.
+CACHE_MANIFEST    = '.ffmpeg_transcode_cache.json'
+
+# Deliverables made together from one decode of the source. Each output has its own
+# bitrate, buffer (twice the bitrate, as for a single transcode), scale (None keeps
+# the source size) and append name. Audio format and bitrate come from the window.
+OUTPUT_PRESETS = {
+    'YouTube + Social + Review': [
+        {'append_name': 'youtube', 'vbr': '20M', 'buffer': '40M', 'scale': None},
+        {'append_name': 'social', 'vbr': '8M', 'buffer': '16M', 'scale': '1920:-2'},
+        {'append_name': 'review', 'vbr': '4M', 'buffer': '8M', 'scale': '1280:-2'},
+        ],
+    }
+CUSTOM_PRESET = 'Custom'
+
+# Background mode. Jobs go to Backburner through cmdjob, or to a stand-in that runs them
+# on this machine when BACKBURNER_LOCAL is set or cmdjob isn't installed.
+BACKBURNER_CMDJOB = os.path.join('/opt', 'Autodesk', 'backburner', 'cmdjob')
+BACKBURNER_LOCAL  = False
+
+# Seconds Backburner lets a transcode or concat job run before killing it. A whole file
+# is one job unless SEGMENT_SECONDS is set, so allow for long masters. None for no limit.
+BACKBURNER_TIMEOUT = 24 * 3600
+
+# Split sources longer than this many seconds into segments encoded by separate jobs and
+# joined by a concat job. 0 sends each file as a single job.
+SEGMENT_SECONDS   = 0
+
+# ==============================================================================
+# [ffmpeg Progress]
+# ==============================================================================
+
+DURATION_PATTERN = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+def parse_duration(line):
+    """
+    Seconds from the 'Duration: 00:01:23.45' line ffmpeg logs for the input, or None.
+    """
+
+    match = DURATION_PATTERN.search(line)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def parse_progress(lines):
+    """
+    Turn the key=value lines written by -progress into one event per update:
+    {'out_time': seconds, 'fps': float, 'speed': float, 'end': bool}.
+    Values ffmpeg doesn't know yet (N/A) are None. Each block of keys is closed
+    by progress=continue, or progress=end on the last one.
+    """
+
+    block = {}
+    for line in lines:
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            continue
+        block[key] = value
+        if key != 'progress':
+            continue
+
+        # out_time_ms is in microseconds too, newer builds add the correctly named out_time_us.
+        out_time = _number(block.get('out_time_us', block.get('out_time_ms', '')))
+        yield {
+            'out_time': None if out_time is None else out_time / 1000000.0,
+            'fps': _number(block.get('fps', '')),
+            'speed': _number(block.get('speed', '').rstrip('x')),
+            'end': value == 'end',
+            }
+        block = {}
+
+def _number(value):
+    # ffmpeg writes N/A until it has a value.
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+def format_eta(seconds):
+    if seconds is None:
+        return '--'
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f'{seconds // 3600}h {seconds % 3600 // 60:02d}m'
+    if seconds >= 60:
+        return f'{seconds // 60}m {seconds % 60:02d}s'
+    return f'{seconds}s'
+
+# ==============================================================================
+# [Transcode Queue]
+# ==============================================================================
+
+def job_count():
+    if MAX_JOBS > 0:
+        return MAX_JOBS
+    return max(1, (os.cpu_count() or 1) // X264_THREADS)
+
+class TranscodeJob:
+    """
+    One ffmpeg run. State goes queued -> running -> done / failed / cancelled.
+    """
+
+    def __init__(self, source, destination, command, settings=None, outputs=None):
+        self.source = source
+        self.destination = destination
+        self.command = command
+
+        # (destination, settings) of every file the command writes, one unless it's a preset.
+        self.outputs = outputs or [(destination, settings)]
+        self.cache_key = None
+        self.name = os.path.basename(destination)
+        if len(self.outputs) > 1:
+            self.name = f"{os.path.basename(source)} ({len(self.outputs)} outputs)"
+        self.state = "queued"
+        self.returncode = None
+        self.start_time = None
+        self.end_time = None
+        self.process = None
+
+        # Filled in while ffmpeg runs. duration is the length of the source in seconds,
+        # out_time how much of it has been encoded.
+        self.duration = None
+        self.out_time = 0.0
+        self.fps = 0.0
+        self.speed = 0.0
+        self.log = collections.deque(maxlen=LOG_LINES)
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    def fraction(self):
+        if self.state == "done":
+            return 1.0
+        if not self.duration:
+            return 0.0
+        return min(1.0, self.out_time / self.duration)
+
+    def eta(self):
+        if self.state != "running" or not self.duration or not self.speed:
+            return None
+        return max(0.0, self.duration - self.out_time) / self.speed
+
+    def status(self):
+        if self.state == "running":
+            return (f"{self.name}:  {self.fraction() * 100:.0f}%   {self.fps:.0f} fps   "
+                    f"{self.speed:.2f}x   ETA {format_eta(self.eta())}")
+        if self.state == "done":
+            return f"{self.name}:  done in {format_eta(self.elapsed())}"
+        return f"{self.name}:  {self.state}"
+
+class TranscodeQueue:
+    """
+    Runs TranscodeJobs on a pool of worker threads, each one driving a single
+    ffmpeg process, so nothing blocks Flame's UI thread.
+
+    on_update(job) is called from a worker thread whenever a job starts or finishes.
+    Progress is only stored on the job, read it with progress() or the job's own
+    fraction() and eta().
+    """
+
+    def __init__(self, jobs, workers=None, on_update=None):
+        self.jobs = list(jobs)
+        self.workers = min(workers or job_count(), max(1, len(self.jobs)))
+        self.on_update = on_update
+        self.cancelled = False
+        self.finished = threading.Event()
+        self._pending = queue.Queue()
+        self._remaining = len(self.jobs)
+        self._lock = threading.Lock()
+
+        for job in self.jobs:
+            self._pending.put(job)
+
+    def start(self):
+        if not self.jobs:
+            self.finished.set()
+            return
+        for _ in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def cancel(self):
+        # Drop anything still queued and stop what's running.
+        self.cancelled = True
+        for job in self.jobs:
+            if job.process is not None and job.process.poll() is None:
+                job.process.terminate()
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    def progress(self):
+        """
+        Overall (fraction, eta) of the queue, measured in seconds of media encoded.
+        Jobs that haven't started yet are counted at the average known duration and
+        the ETA is the remaining media over the combined speed of the running jobs.
+        """
+
+        known = [job.duration for job in self.jobs if job.duration]
+        if not known:
+            finished = sum(1 for job in self.jobs if job.state not in ("queued", "running"))
+            return finished / max(1, len(self.jobs)), None
+        average = sum(known) / len(known)
+
+        total = remaining = speed = 0.0
+        for job in self.jobs:
+            duration = job.duration or average
+            total += duration
+            if job.state == "running":
+                remaining += max(0.0, duration - job.out_time)
+                speed += job.speed
+            elif job.state == "queued":
+                remaining += duration
+
+        return 1.0 - remaining / total, (remaining / speed if speed else None)
+
+    def _update(self, job):
+        if self.on_update is not None:
+            try:
+                self.on_update(job)
+            except Exception as e:
+                print(f"[ {SCRIPT_NAME} ] Progress callback failed: {e}")
+
+    def _worker(self):
+        while True:
+            try:
+                job = self._pending.get_nowait()
+            except queue.Empty:
+                return
+
+            if self.cancelled:
+                job.state = "cancelled"
+            else:
+                self._run(job)
+            self._update(job)
+
+            with self._lock:
+                self._remaining -= 1
+                if self._remaining == 0:
+                    self.finished.set()
+
+    def _run(self, job):
+        job.state = "running"
+        job.start_time = time.time()
+        self._update(job)
+
+        try:
+            job.process = subprocess.Popen(
+                job.command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,     # -progress pipe:1
+                stderr=subprocess.PIPE,     # ffmpeg's log, only kept for the duration and errors
+                text=True,
+                bufsize=1,
+            )
+        except OSError as e:
+            job.end_time = time.time()
+            job.state = "failed"
+            job.log.append(str(e))
+            return
+
+        # cancel() may have run between taking the job and starting ffmpeg.
+        if self.cancelled:
+            job.process.terminate()
+
+        log_reader = threading.Thread(target=self._read_log, args=(job,), daemon=True)
+        log_reader.start()
+
+        for event in parse_progress(job.process.stdout):
+            for key in ('out_time', 'fps', 'speed'):
+                if event[key] is not None:
+                    setattr(job, key, event[key])
+
+        job.returncode = job.process.wait()
+        log_reader.join()
+        job.end_time = time.time()
+        if self.cancelled and job.returncode != 0:
+            job.state = "cancelled"
+        else:
+            job.state = "done" if job.returncode == 0 else "failed"
+
+    def _read_log(self, job):
+        for line in job.process.stderr:
+            line = line.rstrip()
+            if job.duration is None:
+                job.duration = parse_duration(line)
+            job.log.append(line)
+
+# ==============================================================================
+# [Transcode Cache]
+# ==============================================================================
+
+class TranscodeCache:
+    """
+    Manifest of the outputs transcoded into one folder. An output is up to date when
+    its source still has the same path, size and mtime, it was encoded with the same
+    settings and the output file is still the one that was written. A job is only up
+    to date when all of its outputs are.
+
+    record() is called from the queue's worker threads.
+    """
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, CACHE_MANIFEST)
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            # No manifest yet, or a broken one, either way everything gets encoded.
+            pass
+
+    @staticmethod
+    def key(job):
+        """
+        The source stamp the outputs depend on, taken before the job runs so a source
+        changed during the encode isn't recorded as current.
+        """
+
+        try:
+            st = os.stat(job.source)
+        except OSError:
+            return None
+        return {'source': job.source, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+    def is_current(self, job):
+        if job.cache_key is None:
+            return False
+        return all(self._output_current(job, destination, settings) for destination, settings in job.outputs)
+
+    def _output_current(self, job, destination, settings):
+        entry = self.entries.get(os.path.basename(destination))
+        if entry is None:
+            return False
+        if any(entry.get(name) != value for name, value in dict(job.cache_key, settings=settings).items()):
+            return False
+
+        try:
+            st = os.stat(destination)
+        except OSError:
+            return False
+        return entry.get('output_size') == st.st_size and entry.get('output_mtime_ns') == st.st_mtime_ns
+
+    def record(self, job):
+        if job.cache_key is None:
+            return
+
+        with self._lock:
+            for destination, settings in job.outputs:
+                try:
+                    st = os.stat(destination)
+                except OSError:
+                    continue
+                self.entries[os.path.basename(destination)] = dict(
+                    job.cache_key, settings=settings, output_size=st.st_size, output_mtime_ns=st.st_mtime_ns)
+            try:
+                temp_path = self.path + '.tmp'
+                with open(temp_path, 'w') as f:
+                    json.dump(self.entries, f, indent=4, sort_keys=True)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"[ {SCRIPT_NAME} ] Could not write {self.path}: {e}")
+
+# ==============================================================================
+# [Backburner]
+# ==============================================================================
+
+def create_backburner_job(job_name, description, dependencies, cmd, timeout=600):
+    """
+    Send a command line job to Backburner.
+
+    :param job_name: Name of the Backburner job
+    :param description: Description of the Backburner job
+    :param dependencies: None if the Backburner job should execute arbitrarily,
+                         otherwise a Backburner id or a list of ids that must
+                         complete first.
+    :param cmd: Command line to execute
+    :param timeout: Seconds Backburner lets the job run before killing it,
+                    None for no limit.
+    :return backburner_job_id: Id of the Backburner job created
+    """
+
+    backburner_args = []
+    backburner_args.append("-userRights")  # Honor application user (not root)
+    if timeout:
+        backburner_args.append("-timeout:%d" % timeout)
+    backburner_args.append('-jobName:"%s"' % job_name)
+    backburner_args.append('-description:"%s"' % description)
+
+    # Set the Backburner job dependencies
+    if dependencies:
+        if isinstance(dependencies, list):
+            backburner_args.append("-dependencies:%s" % ",".join(dependencies))
+        else:
+            backburner_args.append("-dependencies:%s" % dependencies)
+
+    full_cmd = "%s %s %s" % (BACKBURNER_CMDJOB, " ".join(backburner_args), cmd)
+
+    stdout, stderr = execute_command(full_cmd)
+    print(stdout)
+
+    job_id_regex = re.compile(r"(?<=Successfully submitted job )(\d+)")
+    match = job_id_regex.search(stdout or "")
+
+    if match:
+        backburner_job_id = match.group(0)
+        print("Backburner job created (%s)" % backburner_job_id)
+        return backburner_job_id
+
+    else:
+        print("Backburner job not created\n%s" % stderr)
+
+    return None
+
+def execute_command(command):
+
+    # Flame 2022.2+ can run a command line through the Autodesk Flame Multi-Purpose
+    # Daemon, which avoids fork() duplicating Flame's memory.
+    #
+    # Note: Environment variables will not be forwarded to the executed command.
+    #
+    if "execute_command" in dir(flame):
+        _, stdout, stderr = flame.execute_command(
+            command=command,
+            blocking=True,
+            shell=True,
+            capture_stdout=True,
+            capture_stderr=True,
+        )
+    else:
+        process = subprocess.Popen([command], stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
+        stdout, stderr = process.communicate()
+        stdout = stdout.decode("utf-8") if stdout else None
+        stderr = stderr.decode("utf-8") if stderr else None
+    return stdout, stderr
+
+class Backburner:
+    """
+    Submits jobs to Backburner with cmdjob.
+    """
+
+    name = "Backburner"
+
+    def submit(self, job_name, description, dependencies, cmd):
+        return create_backburner_job(job_name, description, dependencies, cmd, timeout=BACKBURNER_TIMEOUT)
+
+class LocalBackburner:
+    """
+    Stand-in for Backburner with the same submit(). Runs each command line on this
+    machine once the jobs it depends on have finished, a few at a time, and skips
+    it if any of them failed. For testing background mode without a farm.
+    """
+
+    name = "Local"
+
+    def __init__(self, workers=None):
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._slots = threading.Semaphore(workers or job_count())
+
+    def submit(self, job_name, description, dependencies, cmd):
+        job_id = str(next(self._ids))
+        if dependencies and not isinstance(dependencies, list):
+            dependencies = [dependencies]
+        self.jobs[job_id] = {"name": job_name, "returncode": None, "finished": threading.Event()}
+        threading.Thread(target=self._run, args=(job_id, dependencies or [], cmd), daemon=True).start()
+        print(f"[ {SCRIPT_NAME} ] Local job created ({job_id}) {job_name}")
+        return job_id
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        for job in list(self.jobs.values()):
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            if not job["finished"].wait(remaining):
+                return False
+        return True
+
+    def _run(self, job_id, dependencies, cmd):
+        job = self.jobs[job_id]
+        for dependency in dependencies:
+            self.jobs[dependency]["finished"].wait()
+
+        if any(self.jobs[dependency]["returncode"] != 0 for dependency in dependencies):
+            job["returncode"] = -1
+            print(f"[ {SCRIPT_NAME} ] Local job ({job_id}) {job['name']} skipped, a dependency failed.")
+        else:
+            with self._slots:
+                job["returncode"] = subprocess.call(cmd, shell=True, stdin=subprocess.DEVNULL,
+                                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            print(f"[ {SCRIPT_NAME} ] Local job ({job_id}) {job['name']} finished. Return code: {job['returncode']}")
+        job["finished"].set()
+
+def probe_duration(file):
+    """
+    Length of the source in seconds from ffprobe, or None if it can't be read.
+    """
+
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", file],
+            stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, ValueError):
+        return None
+
+def farm_command(command, start=None, length=None, outputs=None):
+    """
+    The job's ffmpeg command for running unattended: no -progress, optionally reading
+    only start..start+length of the source and writing to other output paths.
+    """
+
+    command = list(command)
+    if "-progress" in command:
+        i = command.index("-progress")
+        del command[i:i + 2]
+    if start is not None:
+        i = command.index("-i")
+        command[i:i] = ["-ss", f"{start:.3f}", "-t", f"{length:.3f}"]
+    if outputs:
+        command = [outputs.get(arg, arg) for arg in command]
+    return command
+
+def segment_folder(destination):
+    name = os.path.basename(destination)
+    return os.path.join(os.path.dirname(destination), f".{name}.segments")
+
+def segment_path(destination, index):
+    stem, ext = os.path.splitext(os.path.basename(destination))
+    return os.path.join(segment_folder(destination), f"{stem}_{index:04d}{ext}")
+
+def concat_quote(name):
+    # The concat demuxer's own quoting, not the shell's: quote the name and write each ' as '\''
+    return "'" + name.replace("'", "'\\''") + "'"
+
+def concat_command(destination, segments):
+    """
+    Write the concat list for destination's segments and return the shell command that
+    joins them without re-encoding, then removes them.
+    """
+
+    folder = segment_folder(destination)
+    list_path = os.path.join(folder, "segments.txt")
+    with open(list_path, "w") as f:
+        for index in range(segments):
+            f.write("file %s\n" % concat_quote(os.path.basename(segment_path(destination, index))))
+
+    join = ["ffmpeg", "-nostdin", "-y", "-nostats", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart", destination]
+    script = f"{shlex.join(join)} && rm -rf {shlex.quote(folder)}"
+    return shlex.join(["/bin/sh", "-c", script])
+
 # ==============================================================================
 # [Main Script]
 # ==============================================================================
@@ -80,12 +688,13 @@ class ffmpeg_transcode:
 
         # Make selection available to the other functions
         self.selection = selection
+        self.updating_progress = False
+        self.caches = {}
 
         # Open main window
         self.main_window()
 
-    # Set-up the sub-process to do all the heavy lifting.
-    def do_transcode(self, file, video_frmt, vbr, buffer, audio_frmt, abr, append_name, subfolder):
+    def destination_path(self, file, video_frmt, append_name, subfolder):
 
         source_folder = os.path.dirname(file)
         source_filename = os.path.splitext(os.path.basename(file))[0]
@@ -101,6 +710,7 @@ class ffmpeg_transcode:
             destination_folder = source_folder
 
         # If the append name isn't blank, add it to the existing name with an underscore.
+        destination_filename = source_filename
         if append_name != "":
             destination_filename = source_filename + "_" + append_name
 
@@ -108,7 +718,25 @@ class ffmpeg_transcode:
         destination_filename = destination_filename + "." + video_frmt
 
         # Set full file path
-        destination_file = os.path.join(destination_folder, destination_filename)
+        return os.path.join(destination_folder, destination_filename)
+
+    def encode_args(self, vbr, buffer, audio_frmt, abr):
+        """
+        Everything after the input that changes an output, less the file name.
+        """
+
+        return ["-c:v", "libx264", "-b:v", vbr, "-maxrate", vbr, "-bufsize", buffer,
+                "-pix_fmt", "yuv420p", "-c:a", audio_frmt, "-b:a", abr, "-preset", "slow",
+                "-movflags", "+faststart"]
+
+    def settings_hash(self, args):
+        # Hashed so the cache can tell when an output's settings change.
+        return hashlib.sha1(json.dumps(args).encode()).hexdigest()
+
+    # Build the ffmpeg job that does all the heavy lifting.
+    def do_transcode(self, file, video_frmt, vbr, buffer, audio_frmt, abr, append_name, subfolder):
+
+        destination_file = self.destination_path(file, video_frmt, append_name, subfolder)
 
         
         print ("-------- ffmpeg Transcode --------\n")
@@ -121,25 +749,242 @@ class ffmpeg_transcode:
         print (f"Audio Bitrate:   {abr}")
         print ("----------------------------------\n")
 
-        # Create the subprocess
-        transcode = subprocess.Popen(
-            ["ffmpeg", "-nostdin", "-y", "-i", file, "-c:v", "libx264", "-b:v", vbr,
-             "-maxrate", vbr, "-bufsize", buffer, "-pix_fmt", "yuv420p",
-             "-c:a", audio_frmt, "-b:a", abr, "-preset", "slow",
-             "-movflags", "+faststart", destination_file],
-            stdin=subprocess.DEVNULL,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,   # merge stderr into stdout, one stream to read
-            text=True,
-            bufsize=1,
-        )
+        encode_args = self.encode_args(vbr, buffer, audio_frmt, abr)
+
+        # The job queue runs this, x264 threads are capped so several encodes can share the machine.
+        command = (["ffmpeg", "-nostdin", "-y", "-progress", "pipe:1", "-nostats", "-i", file] + encode_args +
+                   ["-threads", str(X264_THREADS), destination_file])
+
+        return TranscodeJob(file, destination_file, command, self.settings_hash(encode_args))
+
+    # Build one ffmpeg job that decodes the source once and writes every output of a preset.
+    def do_preset_transcode(self, file, video_frmt, outputs, audio_frmt, abr, subfolder):
+
+        destinations = [self.destination_path(file, video_frmt, output['append_name'], subfolder) for output in outputs]
+
+        print ("-------- ffmpeg Transcode --------\n")
+        print (f"Source:          {file}")
+        for destination, output in zip(destinations, outputs):
+            print (f"Destination:     {destination}")
+            print (f"    Video Bitrate:   {output['vbr']}")
+            print (f"    Buffer Size:     {output['buffer']}")
+            print (f"    Scale:           {output['scale'] or 'source'}")
+        print (f"Video Format:    {video_frmt}")
+        print (f"Audio Format:    {audio_frmt}")
+        print (f"Audio Bitrate:   {abr}")
+        print ("----------------------------------\n")
+
+        # The decoded video is split once per output, outputs that are scaled get their own scale filter.
+        split = f"[0:v]split={len(outputs)}" + "".join(f"[split{i}]" for i in range(len(outputs)))
+        filters = [split]
+        output_args = []
+        job_outputs = []
+        for i, (destination, output) in enumerate(zip(destinations, outputs)):
+            label = f"[split{i}]"
+            scale_args = []
+            if output['scale']:
+                filters.append(f"{label}scale={output['scale']}[scaled{i}]")
+                label = f"[scaled{i}]"
+                scale_args = ["-vf", f"scale={output['scale']}"]
+
+            encode_args = self.encode_args(output['vbr'], output['buffer'], audio_frmt, abr)
+            output_args += (["-map", label, "-map", "0:a?"] + encode_args +
+                            ["-threads", str(X264_THREADS), destination])
+
+            # Hashed as the equivalent single transcode, so both share cache entries.
+            job_outputs.append((destination, self.settings_hash(scale_args + encode_args)))
+
+        command = (["ffmpeg", "-nostdin", "-y", "-progress", "pipe:1", "-nostats", "-i", file,
+                    "-filter_complex", ";".join(filters)] + output_args)
+
+        return TranscodeJob(file, destinations[0], command, outputs=job_outputs)
+
+    def cache_for(self, job):
+        folder = os.path.dirname(job.destination)
+        if folder not in self.caches:
+            self.caches[folder] = TranscodeCache(folder)
+        return self.caches[folder]
+
+    def skip_current(self, jobs):
+        """
+        Take the source stamps for the cache and return only the jobs whose output isn't up to date.
+        """
+
+        pending = []
+        for job in jobs:
+            job.cache_key = TranscodeCache.key(job)
+            if self.cache_for(job).is_current(job):
+                print(f"[ {SCRIPT_NAME} ] Skipping {job.name}, already up to date.")
+            else:
+                pending.append(job)
+        return pending
+
+    def report_job(self, job):
+        """
+        Called from the queue's worker threads. Prints and records finished outputs in
+        the cache, never touches Flame or Qt.
+        """
+
+        if job.state == "running":
+            print(f"[ {SCRIPT_NAME} ] Started {job.name}")
+        elif job.state == "done":
+            print(f"[ {SCRIPT_NAME} ] Finished {job.name} in {job.elapsed():.1f}s ({job.fps:.0f} fps, {job.speed:.2f}x)")
+            self.cache_for(job).record(job)
+        elif job.state == "failed":
+            print(f"[ {SCRIPT_NAME} ] Failed {job.name}. Return code: {job.returncode}")
+            for line in list(job.log)[-5:]:
+                print(f"[ {job.name} ] {line}")
+        elif job.state == "cancelled":
+            print(f"[ {SCRIPT_NAME} ] Cancelled {job.name}")
+
+    def update_progress(self):
+        """
+        Refresh the progress window from the jobs. Runs on Flame's UI thread from a
+        QTimer, the queue's threads never touch Qt.
+        """
+
+        # Setting the window's values pauses Qt, which can fire the timer again.
+        if self.updating_progress:
+            return
+        self.updating_progress = True
+
+        try:
+            fraction, eta = self.queue.progress()
+            lines = [f"Total:  {fraction * 100:.0f}%   ETA {format_eta(eta)}", ""]
+            lines += [job.status() for job in self.queue.jobs]
+
+            if self.queue.finished.is_set():
+                self.progress_timer.stop()
+                self.cancel_transcode_button.enabled = False
+                failed = sum(1 for job in self.queue.jobs if job.state != "done")
+                if self.queue.cancelled:
+                    title = "Transcode cancelled"
+                elif failed:
+                    title = f"Transcode finished, {failed} failed"
+                else:
+                    title = "Transcode finished"
+                self.progress_window.tasks_completed(task_progress_message="\n".join(lines[2:]), title=title)
+            else:
+                self.progress_window.current_task = int(fraction * 100)
+                self.progress_window.text = "\n".join(lines)
+        finally:
+            self.updating_progress = False
+
+    def cancel_transcode(self):
+        """
+        Cancel button or escape in the progress window. Nothing else is started and the
+        running ffmpeg processes are stopped, the window shows the result once they exit.
+        """
+
+        if self.queue.finished.is_set() or self.queue.cancelled:
+            return
+
+        print(f"[ {SCRIPT_NAME} ] Cancelling transcode...")
+        self.queue.cancel()
+        self.cancel_transcode_button.enabled = False
+        self.progress_window.title = "Cancelling..."
+
+    def run_queue(self, jobs):
+        """
+        Start the jobs in the background, follow them in a progress window and report
+        once they are all finished.
+        """
+
+        self.queue = TranscodeQueue(jobs, on_update=self.report_job)
+        print(f"[ {SCRIPT_NAME} ] Transcoding {len(jobs)} file(s), {self.queue.workers} at a time.\n")
+
+        self.progress_window = PyFlameProgressWindow(
+            parent=None,
+            task="Transcoding",
+            total_tasks=100,
+            task_progress_message="{task}: {processing_task}%",
+            title=f"{SCRIPT_NAME}: Transcoding {len(jobs)} file(s)",
+            )
+
+        # The progress window only has a Done button, enabled at the end, so add a way to stop the queue.
+        self.cancel_transcode_button = PyFlameButton(
+            text='Cancel',
+            color=Color.GRAY,
+            connect=self.cancel_transcode,
+            tooltip='Stop the transcodes that are running and skip the rest.',
+            )
+        self.progress_window.progress_window.grid_layout.addWidget(self.cancel_transcode_button, 8, 2)
+        self.progress_window.progress_window.escape_pressed = self.cancel_transcode
+
+        # Parented to the window's dialog so it lives as long as the window does.
+        self.progress_timer = QtCore.QTimer(self.progress_window.progress_window)
+        self.progress_timer.timeout.connect(self.update_progress)
+        self.progress_timer.start(PROGRESS_INTERVAL)
+
+        def summary():
+            self.queue.wait()
+            done = [job for job in jobs if job.state == "done"]
+            failed = [job for job in jobs if job.state != "done"]
+            print(f"\n[ {SCRIPT_NAME} ] Transcode finished: {len(done)} done, {len(failed)} failed or cancelled.")
+            for job in failed:
+                print(f"[ {SCRIPT_NAME} ]     {job.state}: {job.source} (return code {job.returncode})")
+
+        self.queue.start()
+        threading.Thread(target=summary, daemon=True).start()
+
+    def submit_background(self, jobs):
+        """
+        Send the jobs to Backburner, or the local stand-in, instead of running them here.
+
+        With SEGMENT_SECONDS set, a source longer than that is encoded as segment jobs and a
+        concat job per output, which waits on the segments, joins them with -f concat.
+        Outputs made on the farm aren't recorded in the cache until they are transcoded
+        again from here.
+
+        Probing sources and running cmdjob for every job can take a while with a large
+        batch, so it's done on a worker thread and Flame stays usable.
+        """
+
+        if BACKBURNER_LOCAL or not os.path.isfile(BACKBURNER_CMDJOB):
+            farm = LocalBackburner()
+        else:
+            farm = Backburner()
+        self.farm = farm
+        print(f"[ {SCRIPT_NAME} ] Submitting {len(jobs)} file(s) to {farm.name}.\n")
+
+        # Not a daemon, so Flame closing doesn't stop it between a file's segments and its concat.
+        self.submit_thread = threading.Thread(target=self.submit_jobs, args=(farm, jobs))
+        self.submit_thread.start()
+
+    def submit_jobs(self, farm, jobs):
+        """
+        Worker thread of submit_background, never touches Qt.
+        """
+
+        submitted = 0
+        for job in jobs:
+            duration = probe_duration(job.source) if SEGMENT_SECONDS > 0 else None
+            segments = int(math.ceil(duration / SEGMENT_SECONDS)) if duration else 1
+
+            if segments < 2:
+                job_id = farm.submit(f"Transcode {job.name}", job.source, None, shlex.join(farm_command(job.command)))
+                submitted += job_id is not None
+                continue
 
-        for line in transcode.stdout:
-            print(line, end="")
+            segment_ids = []
+            for index in range(segments):
+                parts = {destination: segment_path(destination, index) for destination, _ in job.outputs}
+                for destination in parts:
+                    os.makedirs(segment_folder(destination), exist_ok=True)
+                command = farm_command(job.command, index * SEGMENT_SECONDS, SEGMENT_SECONDS, parts)
+                segment_ids.append(farm.submit(f"Transcode {job.name} [{index + 1} of {segments}]",
+                                               job.source, None, shlex.join(command)))
 
-        transcode.wait()
+            if None in segment_ids:
+                print(f"[ {SCRIPT_NAME} ] Not all segments of {job.name} were submitted, skipping the concat.")
+                continue
 
-        print(f"Return code: {transcode.returncode}")
+            concat_ids = [farm.submit(f"Concat {os.path.basename(destination)}", destination,
+                                      segment_ids, concat_command(destination, segments))
+                          for destination, _ in job.outputs]
+            submitted += None not in concat_ids
+
+        pyflame.print(f'{submitted} of {len(jobs)} file(s) submitted to {farm.name}.')
 
     def main_window(self) -> None:
         """
@@ -191,9 +1036,42 @@ class ffmpeg_transcode:
             else:
                 subfolder = False
 
-            # Send each selected file to do_transcode with the entered values.
-            for item in self.selection:
-                self.do_transcode(item.path, video_frmt, vbr, buffer, audio_frmt, abr, append_name, subfolder)
+            # Build a job for each selected file with the entered values and run them in the background.
+            # A preset makes all of its outputs from one job per file.
+            preset = self.preset_menu.text
+            if preset in OUTPUT_PRESETS:
+                jobs = [self.do_preset_transcode(item.path, video_frmt, OUTPUT_PRESETS[preset], audio_frmt, abr, subfolder)
+                        for item in self.selection]
+            else:
+                jobs = [self.do_transcode(item.path, video_frmt, vbr, buffer, audio_frmt, abr, append_name, subfolder)
+                        for item in self.selection]
+
+            # Outputs still recorded in the cache are left alone, unless everything is to be redone.
+            if self.skip_button.isChecked():
+                pending = self.skip_current(jobs)
+            else:
+                pending = jobs
+                for job in jobs:
+                    job.cache_key = TranscodeCache.key(job)
+
+            if not pending:
+                pyflame.print(f'All {len(jobs)} file(s) are up to date, nothing to transcode.')
+                return
+
+            if self.background_button.isChecked():
+                self.submit_background(pending)
+            else:
+                self.run_queue(pending)
+
+        def preset_changed() -> None:
+            """
+            Bitrate and append name come from the preset, unless it's Custom.
+            """
+
+            custom = self.preset_menu.text == CUSTOM_PRESET
+            self.vbr_text.enabled = custom
+            self.vbr_measure.enabled = custom
+            self.append_text.enabled = custom
 
         def close_window() -> None:
             """
@@ -212,10 +1090,15 @@ class ffmpeg_transcode:
             parent=None,
             escape_pressed=close_window,
             grid_layout_columns=3,
-            grid_layout_rows=7,
+            grid_layout_rows=9,
             )
 
         # Labels
+        self.preset_label = PyFlameLabel(
+            text='Preset',
+            style=Style.NORMAL,
+            align=Align.LEFT,
+            )
         self.vbr_label = PyFlameLabel(
             text='Video Bitrate',
             style=Style.NORMAL,
@@ -261,8 +1144,26 @@ class ffmpeg_transcode:
             checked=False,
             tooltip='',
             )
+        self.background_button = PyFlamePushButton(
+            text='Backburner',
+            checked=False,
+            tooltip='Send the transcodes to Backburner instead of running them on this machine.',
+            )
+        self.skip_button = PyFlamePushButton(
+            text='Skip Up To Date',
+            checked=True,
+            tooltip='Skip files already transcoded from the same source with the same settings.',
+            )
 
         # Menus
+        self.preset_menu = PyFlameMenu(
+            text=CUSTOM_PRESET,
+            menu_options=[CUSTOM_PRESET] + list(OUTPUT_PRESETS),
+            align=Align.LEFT,
+            menu_indicator=False,
+            connect=preset_changed,
+            tooltip='Make several outputs from one decode of each file. Custom uses the values below.',
+            )
         self.video_frmt_menu = PyFlameMenu(
             text='mp4',
             menu_options=['mp4'],
@@ -306,20 +1207,24 @@ class ffmpeg_transcode:
         # [Widget Layout]
         # ------------------------------------------------------------------------------
 
-        self.window.grid_layout.addWidget(self.video_fmt_label, 0, 0)
-        self.window.grid_layout.addWidget(self.video_frmt_menu, 0, 1)
-        self.window.grid_layout.addWidget(self.vbr_label, 1, 0)
-        self.window.grid_layout.addWidget(self.vbr_text, 1, 1)
-        self.window.grid_layout.addWidget(self.vbr_measure, 1, 2)
-        self.window.grid_layout.addWidget(self.audio_fmt_label, 2, 0)
-        self.window.grid_layout.addWidget(self.audio_frmt_menu, 2, 1)
-        self.window.grid_layout.addWidget(self.abr_label, 3, 0)
-        self.window.grid_layout.addWidget(self.abr_text, 3, 1)
-        self.window.grid_layout.addWidget(self.append_label, 4, 0)
-        self.window.grid_layout.addWidget(self.append_text, 4, 1)
-        self.window.grid_layout.addWidget(self.subfolder_button, 5, 1)
-        self.window.grid_layout.addWidget(self.cancel_button, 6, 1)
-        self.window.grid_layout.addWidget(self.transcode_button, 6, 2)
+        self.window.grid_layout.addWidget(self.preset_label, 0, 0)
+        self.window.grid_layout.addWidget(self.preset_menu, 0, 1, 1, 2)
+        self.window.grid_layout.addWidget(self.video_fmt_label, 1, 0)
+        self.window.grid_layout.addWidget(self.video_frmt_menu, 1, 1)
+        self.window.grid_layout.addWidget(self.vbr_label, 2, 0)
+        self.window.grid_layout.addWidget(self.vbr_text, 2, 1)
+        self.window.grid_layout.addWidget(self.vbr_measure, 2, 2)
+        self.window.grid_layout.addWidget(self.audio_fmt_label, 3, 0)
+        self.window.grid_layout.addWidget(self.audio_frmt_menu, 3, 1)
+        self.window.grid_layout.addWidget(self.abr_label, 4, 0)
+        self.window.grid_layout.addWidget(self.abr_text, 4, 1)
+        self.window.grid_layout.addWidget(self.append_label, 5, 0)
+        self.window.grid_layout.addWidget(self.append_text, 5, 1)
+        self.window.grid_layout.addWidget(self.subfolder_button, 6, 1)
+        self.window.grid_layout.addWidget(self.skip_button, 6, 2)
+        self.window.grid_layout.addWidget(self.background_button, 7, 1)
+        self.window.grid_layout.addWidget(self.cancel_button, 8, 1)
+        self.window.grid_layout.addWidget(self.transcode_button, 8, 2)
 
 
         # ------------------------------------------------------------------------------
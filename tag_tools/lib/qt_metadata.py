@@ -16,9 +16,19 @@ Both .mov and .mp4 / .m4v / .m4a files are supported.  The script handles:
   - MP4:  moov → udta → meta  OR  moov → meta  (both locations checked)
   - stco / co64 chunk-offset fixup so media data is never corrupted
   - 'free' padding atom reuse to minimise rewrites
+  - Full rewrites put moov ahead of mdat with a 64 KiB 'free' atom after it,
+    so the next edit can usually be saved in place
+  - In-place saves: when the new moov fits in the old moov + free padding (or
+    moov is the last atom), only that byte range is overwritten, protected by
+    an undo journal, instead of rewriting the whole file
   - Streaming writes: mdat and other large atoms are NEVER loaded into RAM.
     Only the moov atom (metadata/index, typically <1 MB) is parsed fully.
-    The file is written by streaming large atoms directly from the source.
+    The file is written by streaming large atoms directly from the source,
+    kernel-side where possible (reflink, copy_file_range, sendfile).
+  - Lazy reads: QuickTimeFile(path, lazy=True) parses only moov/udta/meta and
+    skips the trak sample tables, for read-only metadata lookups
+  - mmap reads: QuickTimeFile(path, use_mmap=True) walks atoms over a read-only
+    mmap with struct.unpack_from instead of many small seek/read calls
 
 Usage (CLI):
     python qt_metadata.py read  input.mov
@@ -27,6 +37,8 @@ Usage (CLI):
     python qt_metadata.py write input.mp4 com.apple.quicktime.comment "Hello"
     python qt_metadata.py write input.mp4 com.apple.quicktime.comment "Hello" --output out.mp4
     python qt_metadata.py remove input.mp4 com.apple.quicktime.comment
+    python qt_metadata.py batch-read *.mov --key com.apple.quicktime.comment
+    python qt_metadata.py batch-write edits.json
 
 Usage (API):
     from qt_metadata import QuickTimeFile
@@ -35,15 +47,42 @@ Usage (API):
     print(qt.get_metadata("com.apple.quicktime.comment"))
     qt.set_metadata("com.apple.quicktime.comment", "My comment")
     qt.save("output.mp4")   # or qt.save() to overwrite in place
+
+    # Many files at once, on a thread pool:
+    from qt_metadata import batch_read, batch_write
+    results = batch_write({"a.mov": {"com.apple.quicktime.comment": "A"},
+                           "b.mov": {"com.apple.quicktime.comment": "B"}})
+    for path, result in results.items():
+        print(path, result.ok, result.error)
+
+    # Several keys with a single keys/ilst rebuild:
+    with qt.edit() as e:
+        e.set("com.apple.quicktime.title", "Shot 010")
+        e.remove("com.apple.quicktime.comment")
+    qt.save()
 """
 
 import struct
+import array
+import mmap
 import os
 import sys
 import shutil
 import tempfile
 import argparse
-from typing import Optional, Dict, List, Tuple, Any
+import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Optional, Dict, List, Tuple, Any, Callable
+
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # ---------------------------------------------------------------------------
 # Type-indicator constants  (Table 2-4 of the QT file format spec)
@@ -77,8 +116,27 @@ CONTAINER_ATOMS = {
 # We NEVER read their payload into RAM; we stream them on write.
 STREAM_ATOMS = {b"mdat", b"wide"}
 
+# Atoms parsed in lazy mode — just enough to reach moov/udta/meta and ftyp.
+# Everything else (trak, mvhd, the stbl sample tables, ...) only has its
+# offset recorded and is read from disk on demand.
+LAZY_PARSED_ATOMS = {b"ftyp", b"moov", b"udta", b"meta"}
+
 _COPY_CHUNK = 1 << 20   # 1 MiB copy buffer
 
+# Largest single kernel-side copy request (sendfile caps at ~2 GiB per call).
+_KERNEL_COPY_CHUNK = 1 << 30
+
+# FICLONERANGE ioctl from linux/fs.h — shares extents instead of copying.
+_FICLONERANGE = 0x4020940D
+
+# Size of the free atom written after moov whenever save() rewrites the whole
+# file, so later metadata edits can grow moov in place.
+DEFAULT_PADDING = 64 * 1024
+
+# Undo journal written next to a file while its moov/free range is patched in place.
+_JOURNAL_SUFFIX = ".qtjournal"
+_JOURNAL_MAGIC  = b"QTMJRNL1"
+
 
 # ---------------------------------------------------------------------------
 # Low-level binary helpers
@@ -104,6 +162,23 @@ def read_atom_header(stream) -> Optional[Tuple[int, bytes, int]]:
     return size32, atom_type, 8
 
 
+def read_up_to(stream, size: int) -> bytes:
+    """
+    stream.read(size) without allocating *size* bytes up front — the size
+    field of a damaged atom can claim gigabytes the file doesn't have.
+    """
+    if size <= _COPY_CHUNK:
+        return stream.read(size)
+    parts = []
+    while size > 0:
+        chunk = stream.read(min(_COPY_CHUNK, size))
+        if not chunk:
+            break
+        parts.append(chunk)
+        size -= len(chunk)
+    return b"".join(parts)
+
+
 def iter_atoms(stream, end_offset: int):
     """Yield (offset, size, atom_type, header_size) for atoms up to end_offset."""
     while stream.tell() < end_offset:
@@ -118,6 +193,74 @@ def iter_atoms(stream, end_offset: int):
         stream.seek(offset + size)
 
 
+# ---------------------------------------------------------------------------
+# Kernel-side range copy — used to stream mdat on a full rewrite
+# ---------------------------------------------------------------------------
+
+def _clone_range(src_fd: int, src_offset: int, dst_fd: int, length: int) -> int:
+    """Reflink whole blocks with FICLONERANGE (btrfs, XFS, ...); needs block-aligned offsets."""
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return 0
+    dst_offset = os.lseek(dst_fd, 0, os.SEEK_CUR)
+    block = os.fstat(dst_fd).st_blksize or 4096
+    length -= length % block
+    if src_offset % block or dst_offset % block or length <= 0:
+        return 0
+    fcntl.ioctl(dst_fd, _FICLONERANGE,
+                struct.pack("=qQQQ", src_fd, src_offset, length, dst_offset))
+    # The ioctl doesn't move the file position.
+    os.lseek(dst_fd, dst_offset + length, os.SEEK_SET)
+    return length
+
+
+def _copy_file_range(src_fd: int, src_offset: int, dst_fd: int, length: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, min(length, _KERNEL_COPY_CHUNK), src_offset)
+
+
+def _sendfile(src_fd: int, src_offset: int, dst_fd: int, length: int) -> int:
+    return os.sendfile(dst_fd, src_fd, src_offset, min(length, _KERNEL_COPY_CHUNK))
+
+
+# Tried in order; each one picks up where the previous one stopped.
+_KERNEL_COPIERS = [_clone_range]
+if hasattr(os, "copy_file_range"):
+    _KERNEL_COPIERS.append(_copy_file_range)
+if hasattr(os, "sendfile"):
+    _KERNEL_COPIERS.append(_sendfile)
+
+
+def kernel_copy(src_fd: int, src_offset: int, out_stream, length: int) -> int:
+    """
+    Copy *length* bytes from *src_fd* at *src_offset* to the current position
+    of *out_stream* without passing them through Python, trying reflink,
+    copy_file_range and sendfile in turn.  Returns the number of bytes copied,
+    which is less than *length* if no kernel method could finish (the caller
+    copies the rest itself) — 0 if *out_stream* is not a real file.
+    """
+    if length <= 0:
+        return 0
+    try:
+        dst_fd = out_stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return 0
+    out_stream.flush()
+
+    copied = 0
+    for copier in _KERNEL_COPIERS:
+        while copied < length:
+            try:
+                n = copier(src_fd, src_offset + copied, dst_fd, length - copied)
+            except OSError:
+                # Unsupported here (e.g. EXDEV, EINVAL, ENOTSOCK) — try the next method.
+                n = 0
+            if n <= 0:
+                break
+            copied += n
+        if copied >= length:
+            break
+    return copied
+
+
 # ---------------------------------------------------------------------------
 # Atom classes
 # ---------------------------------------------------------------------------
@@ -162,12 +305,16 @@ class PassthroughAtom(Atom):
         self._payload_offset = payload_offset
         self._payload_size   = payload_size
 
+    def read_payload(self) -> bytes:
+        """Load the payload from the source file (on demand)."""
+        with open(self._src_path, "rb") as f:
+            f.seek(self._payload_offset)
+            return read_up_to(f, self._payload_size)
+
     def serialize(self) -> bytes:
         # Materialise only when explicitly requested (e.g. in tests).
         # Normal save() uses write_to() which streams instead.
-        with open(self._src_path, "rb") as f:
-            f.seek(self._payload_offset)
-            payload = f.read(self._payload_size)
+        payload = self.read_payload()
         total = self._payload_size + self.header_size
         if self.header_size == 16:
             hdr = struct.pack(">I4sQ", 1, self.atom_type, total)
@@ -187,7 +334,10 @@ class PassthroughAtom(Atom):
             out_stream.write(struct.pack(">I4s", total_size, self.atom_type))
         remaining = self._payload_size
         with open(self._src_path, "rb") as src:
-            src.seek(self._payload_offset)
+            # Let the kernel move the bytes where it can; copy what's left here.
+            remaining -= kernel_copy(src.fileno(), self._payload_offset,
+                                     out_stream, remaining)
+            src.seek(self._payload_offset + self._payload_size - remaining)
             while remaining > 0:
                 chunk = src.read(min(_COPY_CHUNK, remaining))
                 if not chunk:
@@ -257,12 +407,117 @@ class MetaAtom(ContainerAtom):
 # Atom reader
 # ---------------------------------------------------------------------------
 
+def _meta_has_fullbox(raw_vf: bytes, peek: bytes, payload_size: int) -> bool:
+    """
+    Decide whether a meta atom is a FullBox (version+flags prefix) or a plain
+    Box.  *raw_vf* is the first 4 payload bytes and *peek* the (up to) 8
+    bytes after them.
+    """
+    # Determine whether this is a FullBox (version+flags prefix) or a plain Box.
+    #
+    # A FullBox meta has version=0 and flags that are either 0x000000 or small
+    # known values.  The first byte is the version (must be 0 or 1 for any known
+    # FullBox); the next three bytes are flags.
+    #
+    # A plain-box meta (QuickTime MOV) has NO prefix — the first 4 bytes are
+    # the start of the first child atom's size field, which is always >= 8.
+    #
+    # Heuristic: if the first byte is 0 or 1 AND the 4-byte value is <= 0x01FFFFFF
+    # (a plausible version+flags), treat as FullBox.  Otherwise treat as plain Box.
+    # In practice: FullBox always starts with \x00 (version=0); plain Box starts
+    # with the high byte of a child atom size, which for any real child is also
+    # likely \x00 for small atoms but the *combined* 4-byte value would be a
+    # child size (>= 8 and usually >> 1).  The most reliable signal is: if the
+    # 4-byte value interpreted as a size lands exactly on a valid child atom
+    # boundary, it's a plain Box; otherwise it's a FullBox version+flags.
+    #
+    # Simplest reliable rule used by ffmpeg and mp4v2:
+    #   version byte (raw_vf[0]) must be 0 or 1 for a valid FullBox.
+    #   If raw_vf[0] == 0 and raw_vf[1:4] are plausible flags, assume FullBox.
+    #   But QuickTime plain-box meta ALSO starts with \x00 (high byte of child size).
+    #
+    # The definitive test: peek at what would be the first child if we skip 4 bytes
+    # (FullBox path) vs 0 bytes (plain Box path), and see which parses cleanly.
+    #
+    # Practical shortcut that matches all known real-world files:
+    #   - If ftyp brand is 'qt  ' (QuickTime MOV), meta is a PLAIN BOX.
+    #   - Otherwise (MP4/ISO), meta is a FULLBOX.
+    #
+    # We pass src_path and detect format from the already-parsed atoms above us,
+    # but we don't have that context here.  Instead use the child-size probe:
+    # read the 4 bytes that would be the first child size under plain-box assumption.
+    # If that value is >= 8 and <= payload_size, the plain-box parse is plausible.
+    # If raw_vf interpreted as version+flags has version > 1, it must be plain-box.
+
+    # Detect FullBox vs plain Box using the minimum-child-size rule:
+    #
+    # A valid atom size is always >= 8 (4-byte size + 4-byte type).
+    # If the first 4 bytes of the meta payload, interpreted as a uint32,
+    # are < 8, they cannot be a child atom size — so they must be a
+    # FullBox version+flags field.
+    #
+    # If the value is >= 8, it could be a child atom size (plain Box) or
+    # a very unusual flags value (extremely unlikely in practice).  We
+    # peek at what the first child looks like under both interpretations
+    # and choose the one whose child type is a known meta child atom.
+    #
+    # This correctly handles:
+    #   FullBox flags=0x000000  → first 4 bytes = 0x00000000 < 8 → FullBox ✓
+    #   Plain-box ProRes MOV   → first 4 bytes = 0x00000021 = 33 ≥ 8 → peek → plain ✓
+    #   FullBox flags=0x000001 → first 4 bytes = 0x00000001 < 8 → FullBox ✓
+
+    possible_child_size = struct.unpack(">I", raw_vf)[0]
+
+    if possible_child_size < 8:
+        # Cannot be a child atom size — must be FullBox version+flags.
+        return True
+    elif possible_child_size > payload_size:
+        # Too large to be a child within this meta — must be FullBox.
+        return True
+    else:
+        # Ambiguous: peek at both interpretations and pick the one with
+        # a known child atom type.
+        known_meta_children = {b"hdlr", b"keys", b"ilst", b"free",
+                               b"iloc", b"iinf", b"ipro", b"iref",
+                               b"idat", b"pitm", b"dinf", b"xml "}
+        # Plain-box: first child starts at payload_offset (raw_vf is child[0:4])
+        plain_child_type = raw_vf  # would be type if size were the prev 4 bytes...
+        # Actually for plain-box: raw_vf IS the size of the first child.
+        # The type follows immediately — peek at payload_offset+4:
+        plain_type_peek = peek[:4]
+        plain_ok = (plain_type_peek in known_meta_children
+                    and 8 <= possible_child_size <= payload_size)
+
+        # FullBox: first child starts at payload_offset+4
+        fb_peek = peek[:8]
+        if len(fb_peek) >= 8:
+            fb_child_size = struct.unpack(">I", fb_peek[:4])[0]
+            fb_child_type = fb_peek[4:8]
+            fb_ok = (fb_child_type in known_meta_children
+                     and 8 <= fb_child_size <= payload_size - 4)
+        else:
+            fb_ok = False
+
+        if plain_ok and not fb_ok:
+            return False
+        elif fb_ok and not plain_ok:
+            return True
+        else:
+            # Both or neither plausible — default to FullBox (ISO standard)
+            return True
+
+
 def read_atom(stream, offset: int, size: int, atom_type: bytes,
-              header_size: int, src_path: str) -> Atom:
+              header_size: int, src_path: str, lazy: bool = False) -> Atom:
+    """
+    Read one atom and its children.  With *lazy*, atoms outside the metadata
+    path (see LAZY_PARSED_ATOMS) are not read at all — only their location
+    is recorded, exactly like mdat.
+    """
     payload_offset = offset + header_size
     payload_size   = size   - header_size
 
-    if atom_type in STREAM_ATOMS:
+    if atom_type in STREAM_ATOMS or (lazy and atom_type not in LAZY_PARSED_ATOMS):
         # Never read the payload — record location for streaming on write.
         return PassthroughAtom(offset, size, atom_type, header_size,
                                src_path, payload_offset, payload_size)
@@ -273,100 +528,8 @@ def read_atom(stream, offset: int, size: int, atom_type: bytes,
         if len(raw_vf) < 4:
             raw_vf = b"\x00\x00\x00\x00"
 
-        # Determine whether this is a FullBox (version+flags prefix) or a plain Box.
-        #
-        # A FullBox meta has version=0 and flags that are either 0x000000 or small
-        # known values.  The first byte is the version (must be 0 or 1 for any known
-        # FullBox); the next three bytes are flags.
-        #
-        # A plain-box meta (QuickTime MOV) has NO prefix — the first 4 bytes are
-        # the start of the first child atom's size field, which is always >= 8.
-        #
-        # Heuristic: if the first byte is 0 or 1 AND the 4-byte value is <= 0x01FFFFFF
-        # (a plausible version+flags), treat as FullBox.  Otherwise treat as plain Box.
-        # In practice: FullBox always starts with \x00 (version=0); plain Box starts
-        # with the high byte of a child atom size, which for any real child is also
-        # likely \x00 for small atoms but the *combined* 4-byte value would be a
-        # child size (>= 8 and usually >> 1).  The most reliable signal is: if the
-        # 4-byte value interpreted as a size lands exactly on a valid child atom
-        # boundary, it's a plain Box; otherwise it's a FullBox version+flags.
-        #
-        # Simplest reliable rule used by ffmpeg and mp4v2:
-        #   version byte (raw_vf[0]) must be 0 or 1 for a valid FullBox.
-        #   If raw_vf[0] == 0 and raw_vf[1:4] are plausible flags, assume FullBox.
-        #   But QuickTime plain-box meta ALSO starts with \x00 (high byte of child size).
-        #
-        # The definitive test: peek at what would be the first child if we skip 4 bytes
-        # (FullBox path) vs 0 bytes (plain Box path), and see which parses cleanly.
-        #
-        # Practical shortcut that matches all known real-world files:
-        #   - If ftyp brand is 'qt  ' (QuickTime MOV), meta is a PLAIN BOX.
-        #   - Otherwise (MP4/ISO), meta is a FULLBOX.
-        #
-        # We pass src_path and detect format from the already-parsed atoms above us,
-        # but we don't have that context here.  Instead use the child-size probe:
-        # read the 4 bytes that would be the first child size under plain-box assumption.
-        # If that value is >= 8 and <= payload_size, the plain-box parse is plausible.
-        # If raw_vf interpreted as version+flags has version > 1, it must be plain-box.
-
-        # Detect FullBox vs plain Box using the minimum-child-size rule:
-        #
-        # A valid atom size is always >= 8 (4-byte size + 4-byte type).
-        # If the first 4 bytes of the meta payload, interpreted as a uint32,
-        # are < 8, they cannot be a child atom size — so they must be a
-        # FullBox version+flags field.
-        #
-        # If the value is >= 8, it could be a child atom size (plain Box) or
-        # a very unusual flags value (extremely unlikely in practice).  We
-        # peek at what the first child looks like under both interpretations
-        # and choose the one whose child type is a known meta child atom.
-        #
-        # This correctly handles:
-        #   FullBox flags=0x000000  → first 4 bytes = 0x00000000 < 8 → FullBox ✓
-        #   Plain-box ProRes MOV   → first 4 bytes = 0x00000021 = 33 ≥ 8 → peek → plain ✓
-        #   FullBox flags=0x000001 → first 4 bytes = 0x00000001 < 8 → FullBox ✓
-
-        possible_child_size = struct.unpack(">I", raw_vf)[0]
-
-        if possible_child_size < 8:
-            # Cannot be a child atom size — must be FullBox version+flags.
-            is_fullbox = True
-        elif possible_child_size > payload_size:
-            # Too large to be a child within this meta — must be FullBox.
-            is_fullbox = True
-        else:
-            # Ambiguous: peek at both interpretations and pick the one with
-            # a known child atom type.
-            known_meta_children = {b"hdlr", b"keys", b"ilst", b"free",
-                                   b"iloc", b"iinf", b"ipro", b"iref",
-                                   b"idat", b"pitm", b"dinf", b"xml "}
-            # Plain-box: first child starts at payload_offset (raw_vf is child[0:4])
-            plain_child_type = raw_vf  # would be type if size were the prev 4 bytes... 
-            # Actually for plain-box: raw_vf IS the size of the first child.
-            # The type follows immediately — peek at payload_offset+4:
-            stream.seek(payload_offset + 4)
-            plain_type_peek = stream.read(4)
-            plain_ok = (plain_type_peek in known_meta_children
-                        and 8 <= possible_child_size <= payload_size)
-
-            # FullBox: first child starts at payload_offset+4
-            stream.seek(payload_offset + 4)
-            fb_peek = stream.read(8)
-            if len(fb_peek) >= 8:
-                fb_child_size = struct.unpack(">I", fb_peek[:4])[0]
-                fb_child_type = fb_peek[4:8]
-                fb_ok = (fb_child_type in known_meta_children
-                         and 8 <= fb_child_size <= payload_size - 4)
-            else:
-                fb_ok = False
-
-            if plain_ok and not fb_ok:
-                is_fullbox = False
-            elif fb_ok and not plain_ok:
-                is_fullbox = True
-            else:
-                # Both or neither plausible — default to FullBox (ISO standard)
-                is_fullbox = True
+        peek = stream.read(8)
+        is_fullbox = _meta_has_fullbox(raw_vf, peek, payload_size)
 
         if is_fullbox:
             children = _read_children(stream, payload_offset + 4, offset + size, src_path)
@@ -378,38 +541,130 @@ def read_atom(stream, offset: int, size: int, atom_type: bytes,
                             children, has_fullbox=False)
 
     if atom_type in CONTAINER_ATOMS:
-        children = _read_children(stream, payload_offset, offset + size, src_path)
+        children = _read_children(stream, payload_offset, offset + size, src_path, lazy)
         return ContainerAtom(offset, size, atom_type, header_size, children)
 
     # Small atom — read fully into memory.
     stream.seek(payload_offset)
-    payload = stream.read(payload_size)
+    payload = read_up_to(stream, payload_size)
     return Atom(offset, size, atom_type, header_size, payload)
 
 
-def _read_children(stream, start: int, end: int, src_path: str) -> List[Atom]:
+def _read_children(stream, start: int, end: int, src_path: str,
+                   lazy: bool = False) -> List[Atom]:
     children = []
     stream.seek(start)
     for c_off, c_size, c_type, c_hdr in iter_atoms(stream, end):
-        child = read_atom(stream, c_off, c_size, c_type, c_hdr, src_path)
+        child = read_atom(stream, c_off, c_size, c_type, c_hdr, src_path, lazy)
         children.append(child)
         stream.seek(c_off + c_size)
     return children
 
 
-def read_top_level(stream, src_path: str) -> List[Atom]:
-    """Read all top-level atoms.  Large atoms (mdat) are not loaded into RAM."""
+def read_top_level(stream, src_path: str, lazy: bool = False) -> List[Atom]:
+    """
+    Read all top-level atoms.  Large atoms (mdat) are not loaded into RAM.
+    With *lazy*, only the metadata path is parsed (see read_atom).
+    """
     stream.seek(0, 2)
     file_size = stream.tell()
     stream.seek(0)
     atoms: List[Atom] = []
     for offset, size, atom_type, header_size in iter_atoms(stream, file_size):
-        atom = read_atom(stream, offset, size, atom_type, header_size, src_path)
+        atom = read_atom(stream, offset, size, atom_type, header_size, src_path, lazy)
         atoms.append(atom)
         stream.seek(offset + size)
     return atoms
 
 
+# ---------------------------------------------------------------------------
+# mmap atom reader — same tree as read_top_level, without seek/read calls
+# ---------------------------------------------------------------------------
+
+def _header_at(buf, offset: int) -> Optional[Tuple[int, bytes, int]]:
+    """read_atom_header() over a buffer.  Returns (total_size, type, header_size) or None."""
+    if offset + 8 > len(buf):
+        return None
+    size32, atom_type = struct.unpack_from(">I4s", buf, offset)
+    if size32 == 1:
+        if offset + 16 > len(buf):
+            return None
+        return struct.unpack_from(">Q", buf, offset + 8)[0], atom_type, 16
+    if size32 == 0:
+        return len(buf) - offset, atom_type, 8
+    return size32, atom_type, 8
+
+
+def iter_atoms_buffer(buf, start: int, end: int):
+    """iter_atoms() over a buffer: yield (offset, size, atom_type, header_size)."""
+    offset = start
+    while offset < end:
+        hdr = _header_at(buf, offset)
+        if hdr is None:
+            break
+        size, atom_type, header_size = hdr
+        if size < header_size:
+            break
+        yield offset, size, atom_type, header_size
+        offset += size
+
+
+def read_atom_buffer(buf, offset: int, size: int, atom_type: bytes,
+                     header_size: int, src_path: str, lazy: bool = False) -> Atom:
+    """read_atom() over a buffer.  Bytes are only copied out for in-memory payloads."""
+    payload_offset = offset + header_size
+    payload_size   = size   - header_size
+
+    if atom_type in STREAM_ATOMS or (lazy and atom_type not in LAZY_PARSED_ATOMS):
+        return PassthroughAtom(offset, size, atom_type, header_size,
+                               src_path, payload_offset, payload_size)
+
+    if atom_type == b"meta":
+        raw_vf = bytes(buf[payload_offset:payload_offset + 4])
+        if len(raw_vf) < 4:
+            raw_vf = b"\x00\x00\x00\x00"
+        peek = bytes(buf[payload_offset + 4:payload_offset + 12])
+
+        if _meta_has_fullbox(raw_vf, peek, payload_size):
+            children = _read_children_buffer(buf, payload_offset + 4, offset + size, src_path)
+            return MetaAtom(offset, size, atom_type, header_size, raw_vf, children,
+                            has_fullbox=True)
+        children = _read_children_buffer(buf, payload_offset, offset + size, src_path)
+        return MetaAtom(offset, size, atom_type, header_size, b"\x00\x00\x00\x00",
+                        children, has_fullbox=False)
+
+    if atom_type in CONTAINER_ATOMS:
+        children = _read_children_buffer(buf, payload_offset, offset + size, src_path, lazy)
+        return ContainerAtom(offset, size, atom_type, header_size, children)
+
+    payload = bytes(buf[payload_offset:payload_offset + payload_size])
+    return Atom(offset, size, atom_type, header_size, payload)
+
+
+def _read_children_buffer(buf, start: int, end: int, src_path: str,
+                          lazy: bool = False) -> List[Atom]:
+    return [read_atom_buffer(buf, c_off, c_size, c_type, c_hdr, src_path, lazy)
+            for c_off, c_size, c_type, c_hdr in iter_atoms_buffer(buf, start, end)]
+
+
+def read_top_level_mmap(src_path: str, lazy: bool = False) -> List[Atom]:
+    """
+    read_top_level() over a read-only mmap of *src_path*.  Atoms are walked
+    with struct.unpack_from on a memoryview, so parsing costs no seek/read
+    syscalls — only the pages actually touched are faulted in.
+    """
+    with open(src_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        if file_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return _read_children_buffer(view, 0, file_size, src_path, lazy)
+            finally:
+                view.release()
+
+
 # ---------------------------------------------------------------------------
 # Format detection
 # ---------------------------------------------------------------------------
@@ -568,6 +823,11 @@ def build_hdlr_atom() -> bytes:
 # Size measurement
 # ---------------------------------------------------------------------------
 
+def _free_atom_bytes(size: int) -> bytes:
+    """A zero-filled 'free' atom of *size* bytes in total (size >= 8)."""
+    return struct.pack(">I4s", size, b"free") + b"\x00" * (size - 8)
+
+
 def _measure(atom: Atom) -> int:
     if isinstance(atom, MetaAtom):
         prefix = 4 if atom.has_fullbox else 0
@@ -583,11 +843,73 @@ def _measure(atom: Atom) -> int:
 # stco / co64 fixup — operates on serialised moov bytes only
 # ---------------------------------------------------------------------------
 
-def _patch_stco_co64(moov_bytes: bytearray, delta: int) -> None:
+# array typecodes for unsigned 32/64-bit entries (sizes vary per platform).
+_ARRAY_CODES = {array.array(c).itemsize: c for c in "QLI"}
+
+
+def _patch_table_loop(moov_bytes: bytearray, start: int, count: int,
+                      width: int, delta: int) -> None:
+    """Reference path: one struct.unpack_from / pack_into per entry."""
+    fmt  = ">I" if width == 4 else ">Q"
+    mask = (1 << (8 * width)) - 1
+    for i in range(count):
+        o = start + i * width
+        old = struct.unpack_from(fmt, moov_bytes, o)[0]
+        struct.pack_into(fmt, moov_bytes, o, (old + delta) & mask)
+
+
+def _patch_table_array(moov_bytes: bytearray, start: int, count: int,
+                       width: int, delta: int) -> None:
+    """
+    Whole-table path without NumPy, no per-entry Python code.  Each entry is
+    copied behind a zero word into a slot twice its width (an extended-slice
+    assignment on array), the slots are read as one big-endian integer and the
+    delta, repeated once per slot, is added in a single bignum add.  A carry
+    lands in the entry's own zero word instead of its neighbour and is masked
+    off, so the result wraps per entry exactly like _patch_table_loop.
+    """
+    end  = start + count * width
+    slot = 2 * width
+    mask = (1 << (8 * width)) - 1
+    code = _ARRAY_CODES[width]
+
+    entries = array.array(code)
+    entries.frombytes(memoryview(moov_bytes)[start:end])
+    slots = array.array(code, bytes(slot * count))
+    slots[1::2] = entries
+
+    whole = int.from_bytes(slots.tobytes(), "big")
+    whole += int.from_bytes((delta & mask).to_bytes(slot, "big") * count, "big")
+    whole &= int.from_bytes(mask.to_bytes(slot, "big") * count, "big")
+
+    slots = array.array(code, whole.to_bytes(slot * count, "big"))
+    moov_bytes[start:end] = slots[1::2].tobytes()
+
+
+def _patch_table_numpy(moov_bytes: bytearray, start: int, count: int,
+                       width: int, delta: int) -> None:
+    """Whole-table path using NumPy: the table is viewed big-endian in place."""
+    dtype = ">u4" if width == 4 else ">u8"
+    table = _np.frombuffer(moov_bytes, dtype=dtype, count=count, offset=start)
+    # Unsigned add wraps, so a negative delta is added as its two's complement.
+    table += _np.array(delta & ((1 << (8 * width)) - 1), dtype=dtype)
+
+
+def _default_table_patcher():
+    return _patch_table_numpy if _np is not None else _patch_table_array
+
+
+def _patch_stco_co64(moov_bytes: bytearray, delta: int, patch_table=None) -> None:
     """
     Adjust every stco/co64 entry in the serialised moov bytes by *delta*.
     Only moov bytes are passed in; we never touch mdat.
+
+    Each table is patched in one go by *patch_table* — NumPy when installed,
+    otherwise one bignum add over the whole table (see _patch_table_array).
+    _patch_table_loop is the per-entry reference version.
     """
+    patch_table = patch_table or _default_table_patcher()
+
     def _scan(pos: int, end: int) -> None:
         while pos + 8 <= end:
             size32 = struct.unpack_from(">I", moov_bytes, pos)[0]
@@ -598,25 +920,15 @@ def _patch_stco_co64(moov_bytes: bytearray, delta: int) -> None:
             if size < hdr or pos + size > end:
                 break
 
-            if atype == b"stco":
-                pay = pos + hdr
-                if pay + 8 <= end:
-                    count = struct.unpack_from(">I", moov_bytes, pay + 4)[0]
-                    for i in range(count):
-                        o = pay + 8 + i * 4
-                        if o + 4 > end: break
-                        old = struct.unpack_from(">I", moov_bytes, o)[0]
-                        struct.pack_into(">I", moov_bytes, o, (old + delta) & 0xFFFFFFFF)
-
-            elif atype == b"co64":
-                pay = pos + hdr
+            if atype in (b"stco", b"co64"):
+                pay   = pos + hdr
+                width = 4 if atype == b"stco" else 8
                 if pay + 8 <= end:
                     count = struct.unpack_from(">I", moov_bytes, pay + 4)[0]
-                    for i in range(count):
-                        o = pay + 8 + i * 8
-                        if o + 8 > end: break
-                        old = struct.unpack_from(">Q", moov_bytes, o)[0]
-                        struct.pack_into(">Q", moov_bytes, o, old + delta)
+                    # Never patch past the end of the atom, as before.
+                    count = min(count, (pos + size - (pay + 8)) // width)
+                    if count > 0:
+                        patch_table(moov_bytes, pay + 8, count, width, delta)
 
             elif atype in (b"moov", b"trak", b"mdia", b"minf", b"stbl",
                            b"udta", b"edts", b"dinf"):
@@ -627,6 +939,187 @@ def _patch_stco_co64(moov_bytes: bytearray, delta: int) -> None:
     _scan(0, len(moov_bytes))
 
 
+# ---------------------------------------------------------------------------
+# In-place write journal
+# ---------------------------------------------------------------------------
+
+def _journal_path(path: str) -> str:
+    return path + _JOURNAL_SUFFIX
+
+
+def _lock_exclusive(f) -> None:
+    """
+    Block until *f* holds an exclusive flock.  write_in_place and journal
+    recovery both take it on the media file itself, so they never interleave,
+    across threads or processes.  Released when *f* is closed.  There is no
+    locking where fcntl is unavailable (Windows).
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _roll_back(f, journal: str) -> bool:
+    """Restore *f* from *journal* and delete it.  The caller holds the lock."""
+    try:
+        with open(journal, "rb") as j:
+            data = j.read()
+    except FileNotFoundError:
+        return False
+
+    head = len(_JOURNAL_MAGIC) + 24
+    if len(data) >= head and data.startswith(_JOURNAL_MAGIC):
+        file_size, offset, length = struct.unpack_from(">QQQ", data, len(_JOURNAL_MAGIC))
+        original = data[head:]
+        # A short journal means we crashed while writing it, before the file was touched.
+        if len(original) == length:
+            f.seek(offset)
+            f.write(original)
+            f.truncate(file_size)
+            f.flush()
+            os.fsync(f.fileno())
+
+    os.unlink(journal)
+    return True
+
+
+def write_in_place(path: str, offset: int, old_length: int, new_bytes: bytes) -> None:
+    """
+    Replace *old_length* bytes at *offset* in *path* with *new_bytes*.
+
+    The original bytes and file size are saved to a journal and fsynced before
+    the file is touched, so an interrupted write can be undone by
+    recover_interrupted_save().  When the range runs to the end of the file it
+    may grow or shrink; otherwise *new_bytes* must be exactly *old_length* long.
+    """
+    journal = _journal_path(path)
+    with open(path, "r+b") as f:
+        _lock_exclusive(f)
+        # A journal left by an earlier crash is rolled back before we record ours.
+        _roll_back(f, journal)
+
+        f.seek(0, 2)
+        file_size = f.tell()
+        at_eof = offset + old_length == file_size
+        if len(new_bytes) != old_length and not at_eof:
+            raise ValueError("In-place write must keep the size of a range that is not at EOF.")
+
+        f.seek(offset)
+        original = f.read(old_length)
+        with open(journal, "wb") as j:
+            j.write(_JOURNAL_MAGIC + struct.pack(">QQQ", file_size, offset, len(original)))
+            j.write(original)
+            j.flush()
+            os.fsync(j.fileno())
+
+        f.seek(offset)
+        f.write(new_bytes)
+        if at_eof:
+            f.truncate(offset + len(new_bytes))
+        f.flush()
+        os.fsync(f.fileno())
+
+        os.unlink(journal)
+
+
+def recover_interrupted_save(path: str) -> bool:
+    """
+    Undo an in-place write that was interrupted, using its journal.
+    Returns True if a journal was found and dealt with.
+
+    Waits for any write_in_place still running on *path* — its journal is
+    only stale once the writer has let go of the lock.
+    """
+    journal = _journal_path(path)
+    if not os.path.exists(journal):
+        return False
+
+    with open(path, "r+b") as f:
+        _lock_exclusive(f)
+        return _roll_back(f, journal)
+
+
+# ---------------------------------------------------------------------------
+# Edit session — many sets/removes, one keys/ilst rebuild
+# ---------------------------------------------------------------------------
+
+class MetadataEdit:
+    """
+    Batched metadata edit on a QuickTimeFile.
+
+    keys + ilst are parsed once when the session opens, every set()/remove()
+    works on that in-memory list, and commit() rebuilds keys + ilst once —
+    so writing 40 keys costs the same as writing one.  Used as a context
+    manager it commits on a clean exit and discards the edits on an error.
+
+        with qt.edit() as e:
+            e.set("com.apple.quicktime.title", "Shot 010")
+            e.remove("com.apple.quicktime.comment")
+        qt.save()
+    """
+
+    def __init__(self, qt: "QuickTimeFile"):
+        self._qt   = qt
+        self._moov = qt._moov()
+        self._meta = qt._find_meta(self._moov) if self._moov is not None else None
+        # [namespace, key, raw data payload or None], in keys-atom order.
+        self._entries: List[list] = []
+        if self._meta is not None:
+            keys, values = qt._parse_meta(self._meta)
+            self._entries = [[ns, kv, values.get(i)]
+                             for i, (ns, kv) in enumerate(keys, start=1)]
+        self._dirty = False
+
+    def _find(self, key_bytes: bytes) -> Optional[list]:
+        for entry in self._entries:
+            if entry[1] == key_bytes:
+                return entry
+        return None
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._find(key.encode("utf-8"))
+        if entry is None or entry[2] is None:
+            return None
+        return decode_data_atom(entry[2])[1]
+
+    def set(self, key: str, value: Any, type_indicator: int = TYPE_UTF8) -> None:
+        if self._moov is None:
+            raise ValueError("No 'moov' atom — not a valid QuickTime/MP4 file.")
+        key_bytes = key.encode("utf-8")
+        entry = self._find(key_bytes)
+        if entry is None:
+            entry = [APPLE_QT_NAMESPACE, key_bytes, None]
+            self._entries.append(entry)
+        entry[2] = encode_data_atom(value, type_indicator)[8:]
+        self._dirty = True
+
+    def remove(self, key: str) -> bool:
+        entry = self._find(key.encode("utf-8"))
+        if entry is None:
+            return False
+        self._entries.remove(entry)
+        self._dirty = True
+        return True
+
+    def commit(self) -> None:
+        """Write the edits into the moov tree (call QuickTimeFile.save() to persist)."""
+        if not self._dirty:
+            return
+        meta = self._meta or self._qt._ensure_meta(self._moov)
+        keys   = [(ns, kv) for ns, kv, _ in self._entries]
+        values = {i: v for i, (_, _, v) in enumerate(self._entries, start=1)
+                  if v is not None}
+        self._qt._write_meta(meta, keys, values)
+        self._meta  = meta
+        self._dirty = False
+
+    def __enter__(self) -> "MetadataEdit":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+
+
 # ---------------------------------------------------------------------------
 # High-level QuickTimeFile class
 # ---------------------------------------------------------------------------
@@ -643,22 +1136,55 @@ class QuickTimeFile:
     print(qt.get_metadata("com.apple.quicktime.comment"))
     qt.set_metadata("com.apple.quicktime.comment", "Nice shot!")
     qt.save("clip_tagged.mp4")   # or qt.save() to overwrite in place
+
+    Pass lazy=True when only reading metadata: the sample tables under trak
+    (stsz, stco, stts, ...) are skipped, so only a few KB are read per file.
+    A lazily opened file is read-only — save() raises ValueError.
+
+    Pass use_mmap=True to parse through a read-only mmap instead of many small
+    seek/read calls (see read_top_level_mmap) — much cheaper on network mounts.
+
+    A writable (non-lazy) open first rolls back an in-place save that never
+    finished.  Lazy opens never write to the file; call recover() to do it.
     """
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, lazy: bool = False, use_mmap: bool = False):
         self.path = os.path.abspath(path)
-        with open(self.path, "rb") as f:
-            self._atoms: List[Atom] = read_top_level(f, self.path)
+        self.lazy = lazy
+        self.use_mmap = use_mmap
+        # Roll back a previous in-place save that never finished.
+        if not lazy:
+            recover_interrupted_save(self.path)
+        self._atoms: List[Atom] = self._read_atoms()
         self.format: str = detect_format(self._atoms)
         _m = self._moov()
         # True on-disk moov size — never modified by set_metadata().
         # Used by save() to compute the offset delta for stco/co64 fixup.
         self._disk_moov_size: int = _m.size if _m is not None else 0
 
+    def recover(self) -> bool:
+        """
+        Roll back an interrupted in-place save of this file and re-read it.
+        Returns True if there was one.
+        """
+        if not recover_interrupted_save(self.path):
+            return False
+        self._atoms = self._read_atoms()
+        self.format = detect_format(self._atoms)
+        _m = self._moov()
+        self._disk_moov_size = _m.size if _m is not None else 0
+        return True
+
     # ------------------------------------------------------------------
     # Internal navigation
     # ------------------------------------------------------------------
 
+    def _read_atoms(self) -> List[Atom]:
+        if self.use_mmap:
+            return read_top_level_mmap(self.path, self.lazy)
+        with open(self.path, "rb") as f:
+            return read_top_level(f, self.path, self.lazy)
+
     def _moov(self) -> Optional[ContainerAtom]:
         for a in self._atoms:
             if a.atom_type == b"moov" and isinstance(a, ContainerAtom):
@@ -793,109 +1319,73 @@ class QuickTimeFile:
     # Public write API
     # ------------------------------------------------------------------
 
+    def edit(self) -> MetadataEdit:
+        """Start a batched edit session (see MetadataEdit)."""
+        return MetadataEdit(self)
+
     def set_metadata(self, key: str, value: Any,
                      type_indicator: int = TYPE_UTF8) -> None:
-        moov = self._moov()
-        if moov is None:
-            raise ValueError("No 'moov' atom — not a valid QuickTime/MP4 file.")
-        meta         = self._ensure_meta(moov)
-        keys, values = self._parse_meta(meta)
-        key_bytes = key.encode("utf-8")
-        idx: Optional[int] = None
-        for i, (ns, kv) in enumerate(keys, start=1):
-            if kv == key_bytes:
-                idx = i; break
-        if idx is None:
-            keys.append((APPLE_QT_NAMESPACE, key_bytes))
-            idx = len(keys)
-        values[idx] = encode_data_atom(value, type_indicator)[8:]
-        self._write_meta(meta, keys, values)
+        with self.edit() as e:
+            e.set(key, value, type_indicator)
 
     def set_multiple_metadata(self, entries: Dict[str, Any],
                                type_indicators: Optional[Dict[str, int]] = None) -> None:
         ti = type_indicators or {}
-        for key, val in entries.items():
-            self.set_metadata(key, val, ti.get(key, TYPE_UTF8))
+        with self.edit() as e:
+            for key, val in entries.items():
+                e.set(key, val, ti.get(key, TYPE_UTF8))
 
     def remove_metadata(self, key: str) -> bool:
-        moov = self._moov()
-        if not moov: return False
-        meta = self._find_meta(moov)
-        if not meta: return False
-        keys, values = self._parse_meta(meta)
-        key_bytes = key.encode("utf-8")
-        found_idx: Optional[int] = None
-        for i, (ns, kv) in enumerate(keys, start=1):
-            if kv == key_bytes:
-                found_idx = i; break
-        if found_idx is None:
-            return False
-        new_keys, new_values, new_i = [], {}, 0
-        for old_i, (ns, kv) in enumerate(keys, start=1):
-            if old_i == found_idx: continue
-            new_i += 1
-            new_keys.append((ns, kv))
-            if old_i in values:
-                new_values[new_i] = values[old_i]
-        self._write_meta(meta, new_keys, new_values)
-        return True
+        with self.edit() as e:
+            return e.remove(key)
 
     # ------------------------------------------------------------------
     # Save
     # ------------------------------------------------------------------
 
-    def save(self, output_path: Optional[str] = None) -> None:
+    def save(self, output_path: Optional[str] = None,
+             padding: int = DEFAULT_PADDING) -> None:
         """
         Write the file to *output_path* (or overwrite the source if None).
 
         Strategy
         --------
-        1. Serialise moov (small, in memory) and compute its new size.
-        2. Compute delta = new_moov_size - original_on_disk_moov_size.
-        3. If delta != 0 and moov precedes mdat:
-           a. If a 'free' padding atom follows moov and can absorb the delta,
-              resize it so mdat does not move and stco/co64 need no adjustment.
-           b. Otherwise patch stco/co64 in the serialised moov bytes.
+        1. Serialise moov (small, in memory).
+        2. If saving over the source and the new moov fits in the old moov +
+           its free padding (or that range is the tail of the file), overwrite
+           just that range in place under an undo journal.  mdat does not
+           move, so stco/co64 need no adjustment.
+        3. Otherwise the whole file has to be rewritten, so lay it out for the
+           next edit: moov goes ahead of mdat (moved up if it was at the end),
+           followed by a free atom of *padding* bytes that later saves can
+           grow into.  stco/co64 are patched by however far mdat moved.
         4. Write the file atom by atom, streaming mdat directly from the
            source file — it is never loaded into RAM.
         5. Re-read moov from the newly written file to refresh internal state
            (stco values, disk_moov_size) for any subsequent save() calls.
+
+        *padding* of 0 writes no free atom; otherwise it must be >= 8 bytes.
         """
+        if self.lazy:
+            raise ValueError("File was opened with lazy=True and is read-only.")
+        if padding and padding < 8:
+            raise ValueError("padding must be 0 or at least 8 bytes (a free atom header).")
+
         dest = os.path.abspath(output_path or self.path)
         moov = self._moov()
 
         # ── Serialise moov to bytes ──────────────────────────────────────────
         moov_bytes = bytearray(moov.serialize()) if moov is not None else None
 
-        # ── Compute delta and patch stco/co64 if needed ──────────────────────
-        if moov_bytes is not None and self._moov_before_mdat():
-            new_moov_size = len(moov_bytes)
-            delta = new_moov_size - self._disk_moov_size
-
-            if delta != 0:
-                free_atom = self._free_after_moov()
-
-                if free_atom is not None:
-                    new_free_size = free_atom.size - delta
-                    if new_free_size == 0:
-                        # Free atom exactly fills the gap — drop it.
-                        self._atoms = [a for a in self._atoms if a is not free_atom]
-                        free_atom = None
-                        # delta absorbed; no stco fixup needed
-                    elif new_free_size >= 8:
-                        # Resize free atom — absorbed, no stco fixup.
-                        free_atom.payload = b"\x00" * (new_free_size - 8)
-                        free_atom.size    = new_free_size
-                        # delta absorbed
-                    else:
-                        # Cannot resize to a valid atom — remove and include in delta.
-                        effective_delta = delta + free_atom.size
-                        self._atoms = [a for a in self._atoms if a is not free_atom]
-                        free_atom = None
-                        _patch_stco_co64(moov_bytes, effective_delta)
-                else:
-                    # No free atom — full stco/co64 fixup.
-                    _patch_stco_co64(moov_bytes, delta)
+        # ── Fast path: patch moov + free in place ────────────────────────────
+        if moov_bytes is not None and dest == self.path:
+            region = self._moov_region()
+            if region is not None and self._save_in_place(moov_bytes, region):
+                self._refresh()
+                return
+
+        # ── Full rewrite: moov first, then padding, then mdat ────────────────
+        layout = self._rewrite_layout(moov, moov_bytes, padding)
 
         # ── Write atomically via temp file, streaming large atoms ────────────
         # IMPORTANT ORDERING: all atom.write_to() calls (including PassthroughAtom
@@ -908,11 +1398,11 @@ class QuickTimeFile:
         tmp_fd, tmp_path = tempfile.mkstemp(dir=dest_dir)
         try:
             with os.fdopen(tmp_fd, "wb") as out:
-                for atom in self._atoms:
-                    if moov_bytes is not None and atom.atom_type == b"moov":
-                        out.write(moov_bytes)
+                for item in layout:
+                    if isinstance(item, (bytes, bytearray)):
+                        out.write(item)
                     else:
-                        atom.write_to(out)
+                        item.write_to(out)
             # All reads from the original file are finished here.
             shutil.move(tmp_path, dest)
         except Exception:
@@ -921,25 +1411,106 @@ class QuickTimeFile:
             raise
 
         self.path = dest
+        self._refresh()
 
+    def _refresh(self) -> None:
         # ── Refresh internal state from the file we just wrote ───────────────
         # Re-reading moov (only) ensures _disk_moov_size and stco values in the
         # atom tree exactly match what is on disk, making subsequent save()
         # calls correct without any manual sync arithmetic.
-        with open(dest, "rb") as f:
-            self._atoms = read_top_level(f, dest)
+        self._atoms = self._read_atoms()
         _m = self._moov()
         self._disk_moov_size = _m.size if _m is not None else 0
 
+    def _save_in_place(self, moov_bytes: bytearray,
+                       region: Tuple[int, int, bool]) -> bool:
+        """
+        Overwrite the on-disk moov (+ following free) range with the new moov
+        and whatever free padding is left.  Returns False when the new bytes
+        don't fit and the range isn't at the end of the file.
+        """
+        start, end, at_eof = region
+        room = (end - start) - len(moov_bytes)
+        if room == 0 or (room < 8 and at_eof):
+            new_bytes = bytes(moov_bytes)
+        elif room >= 8:
+            new_bytes = bytes(moov_bytes) + _free_atom_bytes(room)
+        else:
+            return False
+
+        write_in_place(self.path, start, end - start, new_bytes)
+        return True
+
+    def _rewrite_layout(self, moov: Optional[ContainerAtom],
+                        moov_bytes: Optional[bytearray],
+                        padding: int) -> list:
+        """
+        Top-level atoms (and raw byte strings) to write for a full rewrite.
+
+        moov keeps its place if it already precedes mdat, and is moved ahead
+        of the first mdat (and any 'wide' placeholder right before it) if it
+        sits after the media data.  Its old free padding is dropped and a new
+        free atom of *padding* bytes is written after it.  *moov_bytes* has
+        its stco/co64 entries patched for the resulting mdat shift.
+        """
+        if moov is None or moov_bytes is None:
+            return list(self._atoms)
+
+        old_free = self._free_after_moov()
+        moov_index = self._atoms.index(moov)
+        others = [a for a in self._atoms if a is not moov and a is not old_free]
+
+        insert_at = moov_index
+        mdat_indices = [i for i, a in enumerate(others) if a.atom_type == b"mdat"]
+        if mdat_indices and mdat_indices[-1] < insert_at:
+            insert_at = mdat_indices[0]
+            if insert_at > 0 and others[insert_at - 1].atom_type == b"wide":
+                insert_at -= 1
+
+        pad_bytes = _free_atom_bytes(padding) if padding else b""
+
+        # Every mdat after moov moves by the same amount; measure it on the first.
+        pos = sum(_measure(a) for a in others[:insert_at]) + len(moov_bytes) + len(pad_bytes)
+        for a in others[insert_at:]:
+            if a.atom_type == b"mdat":
+                delta = pos - a.offset
+                if delta != 0:
+                    _patch_stco_co64(moov_bytes, delta)
+                break
+            pos += _measure(a)
+
+        layout: list = list(others[:insert_at])
+        layout.append(moov_bytes)
+        if pad_bytes:
+            layout.append(pad_bytes)
+        layout.extend(others[insert_at:])
+        return layout
+
     # ------------------------------------------------------------------
     # Internal helpers
     # ------------------------------------------------------------------
 
-    def _moov_before_mdat(self) -> bool:
-        for a in self._atoms:
-            if a.atom_type == b"moov": return True
-            if a.atom_type == b"mdat": return False
-        return False
+    def _moov_region(self) -> Optional[Tuple[int, int, bool]]:
+        """
+        (start, end, at_eof) of the on-disk moov and any free/skip atom right
+        after it.  Only valid before the atom list is modified by save().
+        """
+        moov = self._moov()
+        if moov is None:
+            return None
+        start = moov.offset
+        end   = moov.offset + self._disk_moov_size
+        index = self._atoms.index(moov)
+        if index + 1 < len(self._atoms):
+            nxt = self._atoms[index + 1]
+            if nxt.atom_type in (b"free", b"skip") and nxt.offset == end:
+                end = nxt.offset + nxt.size
+        with open(self.path, "rb") as f:
+            f.seek(0, 2)
+            file_size = f.tell()
+        # A damaged size field can claim more than the file holds.
+        end = min(end, file_size)
+        return start, end, end == file_size
 
     def _free_after_moov(self) -> Optional[Atom]:
         found_moov = False
@@ -954,12 +1525,116 @@ class QuickTimeFile:
         return None
 
 
+# ---------------------------------------------------------------------------
+# Batch API — many files on a worker pool
+# ---------------------------------------------------------------------------
+
+class BatchResult:
+    """
+    Outcome for one file of batch_read() / batch_write().
+    *metadata* is the file's metadata (read) or the entries written (write);
+    *error* is the error message if the file failed, else None.
+    """
+    __slots__ = ("path", "metadata", "error")
+
+    def __init__(self, path: str, metadata: Optional[Dict[str, Any]] = None,
+                 error: Optional[str] = None):
+        self.path     = path
+        self.metadata = metadata
+        self.error    = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        state = "ok" if self.ok else f"error={self.error!r}"
+        return f"<BatchResult {self.path!r} {state}>"
+
+
+def _batch_read_one(path: str, keys: Optional[List[str]]) -> BatchResult:
+    try:
+        metadata = QuickTimeFile(path, lazy=True, use_mmap=True).all_metadata()
+        if keys is not None:
+            metadata = {k: metadata[k] for k in keys if k in metadata}
+        return BatchResult(path, metadata)
+    except Exception as e:
+        return BatchResult(path, error=f"{type(e).__name__}: {e}")
+
+
+def _batch_write_one(path: str, entries: Dict[str, Any], padding: int) -> BatchResult:
+    try:
+        qt = QuickTimeFile(path)
+        with qt.edit() as e:
+            for key, value in entries.items():
+                # A value of None removes the key.
+                if value is None:
+                    e.remove(key)
+                else:
+                    e.set(key, value)
+        qt.save(padding=padding)
+        return BatchResult(path, dict(entries))
+    except Exception as e:
+        return BatchResult(path, error=f"{type(e).__name__}: {e}")
+
+
+def _run_batch(fn, jobs: List[tuple], workers: Optional[int], processes: bool,
+               callback: Optional[Callable[[BatchResult], None]]
+               ) -> Dict[str, BatchResult]:
+    results: Dict[str, BatchResult] = {}
+    if not jobs:
+        return results
+    # Threads by default: the work is mostly I/O, and forking a host
+    # application (e.g. Flame) for a process pool is not safe.
+    pool_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with pool_class(max_workers=workers) as pool:
+        futures = {pool.submit(fn, *job): job[0] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Only reached if the worker itself died (e.g. a killed process).
+                result = BatchResult(futures[future], error=f"{type(e).__name__}: {e}")
+            results[result.path] = result
+            if callback is not None:
+                callback(result)
+    # Hand results back in the order they were asked for.
+    return {job[0]: results[job[0]] for job in jobs}
+
+
+def batch_read(paths: List[str], keys: Optional[List[str]] = None,
+               workers: Optional[int] = None, processes: bool = False,
+               callback: Optional[Callable[[BatchResult], None]] = None
+               ) -> Dict[str, BatchResult]:
+    """
+    Read metadata from many files in parallel (lazy, read-only parse).
+    Returns {path: BatchResult} in the order of *paths*; failures are
+    reported per file instead of raising.  *callback* is called with each
+    result as it completes, on the calling thread.
+    """
+    jobs = [(path, keys) for path in dict.fromkeys(paths)]
+    return _run_batch(_batch_read_one, jobs, workers, processes, callback)
+
+
+def batch_write(edits: Dict[str, Dict[str, Any]], workers: Optional[int] = None,
+                processes: bool = False, padding: int = DEFAULT_PADDING,
+                callback: Optional[Callable[[BatchResult], None]] = None
+                ) -> Dict[str, BatchResult]:
+    """
+    Apply {path: {key: value}} edits in parallel, saving each file over
+    itself.  A value of None removes that key.  Returns {path: BatchResult}
+    in the order of *edits*; failures are reported per file.
+    """
+    jobs = [(path, entries, padding) for path, entries in edits.items()]
+    return _run_batch(_batch_write_one, jobs, workers, processes, callback)
+
+
 # ---------------------------------------------------------------------------
 # CLI
 # ---------------------------------------------------------------------------
 
 def cmd_read(args):
-    qt = QuickTimeFile(args.input)
+    qt = QuickTimeFile(args.input, lazy=True, use_mmap=True)
     metadata = qt.all_metadata()
     if args.key:
         val = metadata.get(args.key)
@@ -979,7 +1654,7 @@ def cmd_write(args):
     qt = QuickTimeFile(args.input)
     qt.set_metadata(args.key, args.value)
     out = args.output or args.input
-    qt.save(out)
+    qt.save(out, padding=args.padding)
     print(f"Written: {args.key!r} = {args.value!r}  →  {out}")
 
 
@@ -989,10 +1664,39 @@ def cmd_remove(args):
     if not removed:
         print(f"Key not found: {args.key}", file=sys.stderr); sys.exit(1)
     out = args.output or args.input
-    qt.save(out)
+    qt.save(out, padding=args.padding)
     print(f"Removed {args.key!r}  →  {out}")
 
 
+def _print_batch_result(result: BatchResult) -> None:
+    if result.ok:
+        print(json.dumps({"path": result.path, "metadata": result.metadata},
+                         default=repr, ensure_ascii=False))
+    else:
+        print(f"{result.path}: {result.error}", file=sys.stderr)
+
+
+def cmd_batch_read(args):
+    results = batch_read(args.inputs, keys=args.key, workers=args.workers,
+                         processes=args.processes, callback=_print_batch_result)
+    if not all(r.ok for r in results.values()):
+        sys.exit(1)
+
+
+def cmd_batch_write(args):
+    if args.edits == "-":
+        edits = json.load(sys.stdin)
+    else:
+        with open(args.edits, "r", encoding="utf-8") as f:
+            edits = json.load(f)
+    results = batch_write(edits, workers=args.workers, processes=args.processes,
+                          padding=args.padding, callback=_print_batch_result)
+    failed = [r for r in results.values() if not r.ok]
+    print(f"Written {len(results) - len(failed)} of {len(results)} files.")
+    if failed:
+        sys.exit(1)
+
+
 def build_parser() -> argparse.ArgumentParser:
     p = argparse.ArgumentParser(
         description="Read / write QuickTime metadata keys in .mov and .mp4 files",
@@ -1004,6 +1708,8 @@ Examples:
   %(prog)s write clip.mp4 com.apple.quicktime.comment "My comment"
   %(prog)s write clip.mp4 com.apple.quicktime.comment "My comment" --output out.mp4
   %(prog)s remove clip.mp4 com.apple.quicktime.comment
+  %(prog)s batch-read *.mov --key com.apple.quicktime.comment --workers 16
+  %(prog)s batch-write edits.json        # {"clip.mov": {"key": "value"}, ...}
 """)
     sub = p.add_subparsers(dest="cmd", required=True)
 
@@ -1017,14 +1723,37 @@ Examples:
     w.add_argument("key")
     w.add_argument("value")
     w.add_argument("--output", "-o", default=None)
+    w.add_argument("--padding", type=int, default=DEFAULT_PADDING,
+                   help="free bytes reserved after moov when the file is rewritten")
     w.set_defaults(func=cmd_write)
 
     rm = sub.add_parser("remove", help="Remove a metadata key")
     rm.add_argument("input")
     rm.add_argument("key")
     rm.add_argument("--output", "-o", default=None)
+    rm.add_argument("--padding", type=int, default=DEFAULT_PADDING,
+                    help="free bytes reserved after moov when the file is rewritten")
     rm.set_defaults(func=cmd_remove)
 
+    br = sub.add_parser("batch-read", help="Read metadata from many files in parallel")
+    br.add_argument("inputs", nargs="+")
+    br.add_argument("--key", "-k", action="append", default=None,
+                    help="only report this key (repeatable)")
+    br.add_argument("--workers", "-j", type=int, default=None)
+    br.add_argument("--processes", action="store_true",
+                    help="use a process pool instead of threads")
+    br.set_defaults(func=cmd_batch_read)
+
+    bw = sub.add_parser("batch-write",
+                        help="Apply a JSON {path: {key: value}} file of edits in parallel")
+    bw.add_argument("edits", help="JSON file, or - for stdin; a null value removes the key")
+    bw.add_argument("--workers", "-j", type=int, default=None)
+    bw.add_argument("--processes", action="store_true",
+                    help="use a process pool instead of threads")
+    bw.add_argument("--padding", type=int, default=DEFAULT_PADDING,
+                    help="free bytes reserved after moov when a file is rewritten")
+    bw.set_defaults(func=cmd_batch_write)
+
     return p
 
 
@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+qt_metadata_bench.py — Benchmarks for qt_metadata.
+
+stco / co64 fixup
+    Builds synthetic moov atoms with a large chunk offset table and times
+    each _patch_stco_co64 table patcher on it: the per-entry struct loop,
+    the array path and (when installed) the NumPy path.  Every path is
+    checked against the loop's output before its time is reported.
+
+parse
+    Times opening real files with the seek/read reader and the mmap reader,
+    eager and lazy, reading all metadata each time.  Run it on a network
+    mount to see the syscall savings.
+
+run
+    Synthesises MOV / MP4 files for every layout variant — moov before or
+    after mdat, with or without free padding, 32- or 64-bit mdat header,
+    stco or co64, FullBox (MP4) or plain-box (MOV) meta — across mdat sizes
+    and key counts, and times QuickTimeFile construction, all_metadata,
+    set_metadata and save.  Reports files/s, MB/s and peak RSS; --json
+    keeps the numbers for comparing library versions.
+
+corpus / fuzz
+    corpus writes the same variants (plus randomly truncated and corrupted
+    copies) to a folder.  fuzz runs read / set / save over every file in a
+    folder, checks that every chunk offset of the valid files still points
+    at the same media bytes, and tallies the errors raised by broken ones.
+
+Usage:
+    python qt_metadata_bench.py stco
+    python qt_metadata_bench.py stco --chunks 100000 1000000 --repeat 5
+    python qt_metadata_bench.py parse /mnt/deliveries/*.mp4
+    python qt_metadata_bench.py run --sizes 1 64 --keys 1 40 --json before.json
+    python qt_metadata_bench.py corpus /tmp/qt_corpus --mutations 200
+    python qt_metadata_bench.py fuzz /tmp/qt_corpus
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import struct
+import tempfile
+import argparse
+import itertools
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import qt_metadata as qtm
+
+
+# ---------------------------------------------------------------------------
+# Synthetic moov builder
+# ---------------------------------------------------------------------------
+
+def _atom(atom_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), atom_type) + payload
+
+
+def build_moov(chunks: int, co64: bool = False, tracks: int = 1,
+               first_offset: int = 4096, chunk_size: int = 4096) -> bytearray:
+    """
+    A minimal moov → trak → mdia → minf → stbl → stco/co64 tree whose chunk
+    offset table has *chunks* entries per track.
+    """
+    width = 8 if co64 else 4
+    table = bytearray(8 + chunks * width)
+    struct.pack_into(">I", table, 4, chunks)
+    fmt = ">Q" if co64 else ">I"
+    for i in range(chunks):
+        struct.pack_into(fmt, table, 8 + i * width, first_offset + i * chunk_size)
+    offsets = _atom(b"co64" if co64 else b"stco", bytes(table))
+
+    stbl = _atom(b"stbl", _atom(b"stsz", b"\x00" * 12) + offsets)
+    trak = _atom(b"trak", _atom(b"mdia", _atom(b"minf", stbl)))
+    return bytearray(_atom(b"moov", _atom(b"mvhd", b"\x00" * 100) + trak * tracks))
+
+
+# ---------------------------------------------------------------------------
+# stco / co64 fixup benchmark
+# ---------------------------------------------------------------------------
+
+def table_patchers() -> Dict[str, Callable]:
+    patchers = {"loop": qtm._patch_table_loop, "array": qtm._patch_table_array}
+    if qtm._np is not None:
+        patchers["numpy"] = qtm._patch_table_numpy
+    return patchers
+
+
+def time_patcher(moov: bytearray, delta: int, patch_table: Callable,
+                 repeat: int) -> float:
+    """Best-of-*repeat* seconds for one _patch_stco_co64 call."""
+    best = float("inf")
+    for _ in range(repeat):
+        work = bytearray(moov)
+        start = time.perf_counter()
+        qtm._patch_stco_co64(work, delta, patch_table)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_stco(chunk_counts: List[int], repeat: int = 3, delta: int = 70000) -> None:
+    patchers = table_patchers()
+    print(f"{'table':<6} {'chunks':>9}  " + "  ".join(f"{n:>10}" for n in patchers)
+          + "  speedup")
+
+    for co64 in (False, True):
+        for chunks in chunk_counts:
+            moov = build_moov(chunks, co64=co64)
+
+            expected = bytearray(moov)
+            qtm._patch_stco_co64(expected, delta, qtm._patch_table_loop)
+
+            times = {}
+            for name, patch_table in patchers.items():
+                check = bytearray(moov)
+                qtm._patch_stco_co64(check, delta, patch_table)
+                if check != expected:
+                    raise AssertionError(f"{name} patcher disagrees with the loop "
+                                         f"({chunks} chunks, co64={co64})")
+                times[name] = time_patcher(moov, delta, patch_table, repeat)
+
+            fastest = min(t for n, t in times.items() if n != "loop")
+            print(f"{'co64' if co64 else 'stco':<6} {chunks:>9}  "
+                  + "  ".join(f"{times[n] * 1000:>8.1f}ms" for n in patchers)
+                  + f"  {times['loop'] / fastest:>6.1f}x")
+
+
+# ---------------------------------------------------------------------------
+# Parse benchmark
+# ---------------------------------------------------------------------------
+
+def bench_parse(paths: List[str], repeat: int = 3) -> None:
+    print(f"{'reader':<8} {'lazy':<6} {'files':>6}  {'total':>10}  {'per file':>10}")
+    for use_mmap in (False, True):
+        for lazy in (False, True):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for path in paths:
+                    qtm.QuickTimeFile(path, lazy=lazy, use_mmap=use_mmap).all_metadata()
+                best = min(best, time.perf_counter() - start)
+            print(f"{'mmap' if use_mmap else 'stream':<8} {str(lazy):<6} {len(paths):>6}  "
+                  f"{best * 1000:>8.1f}ms  {best / len(paths) * 1000:>8.3f}ms")
+
+
+# ---------------------------------------------------------------------------
+# Synthetic file variants
+# ---------------------------------------------------------------------------
+
+# mdat bytes follow a fixed pattern, so any chunk offset can be checked
+# against the data it should point at.
+_PATTERN_PERIOD = 251
+_PATTERN = bytes((i * 7) % _PATTERN_PERIOD for i in range(_PATTERN_PERIOD))
+_PATTERN_BLOCK = _PATTERN * 4177   # ~1 MiB, a whole number of periods
+
+VARIANT_AXES = {
+    "moov_first": (True, False),
+    "free":       (False, True),
+    "mdat64":     (False, True),
+    "co64":       (False, True),
+    "fullbox":    (True, False),
+}
+
+
+def all_variants() -> List[Dict[str, bool]]:
+    names = list(VARIANT_AXES)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(VARIANT_AXES[n] for n in names))]
+
+
+def variant_name(variant: Dict[str, bool]) -> str:
+    return "_".join([
+        "moov-first" if variant["moov_first"] else "moov-last",
+        "free" if variant["free"] else "nofree",
+        "mdat64" if variant["mdat64"] else "mdat32",
+        "co64" if variant["co64"] else "stco",
+        "mp4" if variant["fullbox"] else "mov",
+    ])
+
+
+def _meta_atom(keys: int, fullbox: bool) -> bytes:
+    key_list = [(qtm.APPLE_QT_NAMESPACE, f"com.example.key{i:03d}".encode())
+                for i in range(keys)]
+    values = {i: qtm.encode_data_atom(f"value {i} " * 4)[8:]
+              for i in range(1, keys + 1)}
+    children = qtm.build_hdlr_atom()
+    if keys:
+        children += qtm.build_keys_atom(key_list) + qtm.build_ilst_bytes(key_list, values)
+    return _atom(b"meta", (b"\x00\x00\x00\x00" if fullbox else b"") + children)
+
+
+def write_variant(path: str, variant: Dict[str, bool], mdat_size: int = 1 << 20,
+                  keys: int = 4, chunks: int = 64, free_size: int = 4096) -> None:
+    """Write one synthetic file.  mdat is streamed, so any size is fine."""
+    fullbox = variant["fullbox"]
+    brand   = b"isom" if fullbox else b"qt  "
+    ftyp    = _atom(b"ftyp", brand + b"\x00\x00\x02\x00" + brand)
+    meta    = _meta_atom(keys, fullbox)
+    free    = _atom(b"free", b"\x00" * (free_size - 8)) if variant["free"] else b""
+    mdat_header_size = 16 if variant["mdat64"] else 8
+    step = max(1, mdat_size // chunks)
+
+    def moov_for(payload_offset: int) -> bytes:
+        fmt    = ">Q" if variant["co64"] else ">I"
+        table  = b"\x00\x00\x00\x00" + struct.pack(">I", chunks) + b"".join(
+            struct.pack(fmt, payload_offset + i * step) for i in range(chunks))
+        offsets = _atom(b"co64" if variant["co64"] else b"stco", table)
+        stbl = _atom(b"stbl", _atom(b"stsz", b"\x00" * 12) + offsets)
+        trak = _atom(b"trak", _atom(b"mdia", _atom(b"minf", stbl)))
+        return _atom(b"moov", _atom(b"mvhd", b"\x00" * 100) + trak + _atom(b"udta", meta))
+
+    if variant["moov_first"]:
+        size = len(moov_for(0))
+        moov = moov_for(len(ftyp) + size + len(free) + mdat_header_size)
+    else:
+        moov = moov_for(len(ftyp) + mdat_header_size)
+
+    if variant["mdat64"]:
+        mdat_header = struct.pack(">I4sQ", 1, b"mdat", 16 + mdat_size)
+    else:
+        mdat_header = struct.pack(">I4s", 8 + mdat_size, b"mdat")
+
+    with open(path, "wb") as f:
+        f.write(ftyp)
+        if variant["moov_first"]:
+            f.write(moov + free)
+        f.write(mdat_header)
+        remaining = mdat_size
+        while remaining > 0:
+            block = _PATTERN_BLOCK[:remaining]
+            f.write(block)
+            remaining -= len(block)
+        if not variant["moov_first"]:
+            f.write(moov + free)
+
+
+def check_chunk_offsets(path: str) -> None:
+    """Raise AssertionError unless every stco/co64 entry points at the right mdat byte."""
+    qt = qtm.QuickTimeFile(path)
+    mdat = next(a for a in qt._atoms if a.atom_type == b"mdat")
+    base = mdat._payload_offset
+
+    def walk(atom):
+        if isinstance(atom, qtm.ContainerAtom):
+            for child in atom.children:
+                yield from walk(child)
+        else:
+            yield atom
+
+    with open(path, "rb") as f:
+        for atom in walk(qt._moov()):
+            if atom.atom_type not in (b"stco", b"co64"):
+                continue
+            width = 4 if atom.atom_type == b"stco" else 8
+            count = struct.unpack_from(">I", atom.payload, 4)[0]
+            for i in range(count):
+                offset = struct.unpack_from(">I" if width == 4 else ">Q",
+                                            atom.payload, 8 + i * width)[0]
+                f.seek(offset)
+                expected = _PATTERN[(offset - base) % _PATTERN_PERIOD]
+                if offset < base or f.read(1) != bytes([expected]):
+                    raise AssertionError(f"{path}: chunk {i} offset {offset} is wrong")
+
+
+# ---------------------------------------------------------------------------
+# Full benchmark
+# ---------------------------------------------------------------------------
+
+def peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def bench_variant(source: str, work: str, repeat: int) -> Dict[str, float]:
+    """Best-of-*repeat* seconds for each stage, each repeat on a fresh copy."""
+    best = {"open": float("inf"), "read": float("inf"),
+            "set": float("inf"), "save": float("inf")}
+    for _ in range(repeat):
+        shutil.copyfile(source, work)
+
+        start = time.perf_counter()
+        qt = qtm.QuickTimeFile(work)
+        opened = time.perf_counter()
+        qt.all_metadata()
+        read = time.perf_counter()
+        qt.set_metadata("com.apple.quicktime.comment", "internal_name:abc_010+client_name:ABC_1000_010")
+        edited = time.perf_counter()
+        qt.save()
+        saved = time.perf_counter()
+
+        best["open"] = min(best["open"], opened - start)
+        best["read"] = min(best["read"], read - opened)
+        best["set"]  = min(best["set"], edited - read)
+        best["save"] = min(best["save"], saved - edited)
+    check_chunk_offsets(work)
+    return best
+
+
+def bench_run(sizes_mb: List[float], key_counts: List[int], repeat: int = 3,
+              only: Optional[str] = None, json_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    variants = [v for v in all_variants() if only is None or only in variant_name(v)]
+    rows: List[Dict[str, Any]] = []
+
+    print(f"{'variant':<40} {'MB':>6} {'keys':>4}  {'open':>8} {'read':>8} {'set':>8} "
+          f"{'save':>8}  {'files/s':>8} {'MB/s':>9}  {'peak RSS':>8}")
+    with tempfile.TemporaryDirectory(prefix="qt_bench_") as tmp:
+        for size_mb, keys, variant in itertools.product(sizes_mb, key_counts, variants):
+            name   = variant_name(variant)
+            ext    = ".mp4" if variant["fullbox"] else ".mov"
+            source = os.path.join(tmp, "source" + ext)
+            work   = os.path.join(tmp, "work" + ext)
+            write_variant(source, variant, mdat_size=int(size_mb * 1024 * 1024), keys=keys)
+            file_mb = os.path.getsize(source) / (1024 * 1024)
+
+            t = bench_variant(source, work, repeat)
+            total = sum(t.values())
+            row = {"variant": name, "mdat_mb": size_mb, "keys": keys,
+                   **{f"{k}_ms": v * 1000 for k, v in t.items()},
+                   "files_per_s": 1 / total, "mb_per_s": file_mb / total,
+                   "peak_rss_mb": peak_rss_mb()}
+            rows.append(row)
+            print(f"{name:<40} {size_mb:>6g} {keys:>4}  "
+                  + " ".join(f"{t[k] * 1000:>6.2f}ms" for k in ("open", "read", "set", "save"))
+                  + f"  {row['files_per_s']:>8.1f} {row['mb_per_s']:>9.1f}  {row['peak_rss_mb']:>6.1f}MB")
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Fuzz corpus
+# ---------------------------------------------------------------------------
+
+def _mutate(data: bytes, rng: random.Random) -> bytes:
+    """Truncate the file, flip bytes, or scribble over an atom size field."""
+    data = bytearray(data)
+    kind = rng.choice(("truncate", "flip", "size"))
+    if kind == "truncate":
+        return bytes(data[:rng.randrange(len(data))])
+    if kind == "flip":
+        for _ in range(rng.randint(1, 16)):
+            data[rng.randrange(len(data))] = rng.randrange(256)
+        return bytes(data)
+    # Overwrite a 4-byte big-endian value just before a known atom type.
+    positions = [i - 4 for i in range(4, len(data) - 4)
+                 if bytes(data[i:i + 4]) in (b"moov", b"trak", b"stbl", b"stco",
+                                               b"co64", b"udta", b"meta", b"keys",
+                                               b"ilst", b"mdat", b"free")]
+    if positions:
+        pos = rng.choice(positions)
+        struct.pack_into(">I", data, pos, rng.choice((0, 1, 7, 8, 0xFFFFFFFF,
+                                                        rng.randrange(1 << 32))))
+    return bytes(data)
+
+
+def write_corpus(out_dir: str, mutations: int = 100, seed: int = 0,
+                 mdat_size: int = 16 * 1024, keys: int = 4) -> int:
+    """Write every variant to out_dir/valid and mutated copies to out_dir/mutated."""
+    valid_dir   = os.path.join(out_dir, "valid")
+    mutated_dir = os.path.join(out_dir, "mutated")
+    os.makedirs(valid_dir, exist_ok=True)
+    os.makedirs(mutated_dir, exist_ok=True)
+
+    valid = []
+    for variant in all_variants():
+        ext = ".mp4" if variant["fullbox"] else ".mov"
+        path = os.path.join(valid_dir, variant_name(variant) + ext)
+        write_variant(path, variant, mdat_size=mdat_size, keys=keys)
+        valid.append(path)
+
+    rng = random.Random(seed)
+    for i in range(mutations):
+        source = rng.choice(valid)
+        with open(source, "rb") as f:
+            data = f.read()
+        name = f"{i:05d}_{os.path.basename(source)}"
+        with open(os.path.join(mutated_dir, name), "wb") as f:
+            f.write(_mutate(data, rng))
+    return len(valid) + mutations
+
+
+def fuzz_folder(folder: str) -> bool:
+    """
+    Read, edit and save a copy of every file under *folder*.  Files under a
+    'valid' folder must round-trip with correct chunk offsets; for the rest
+    the exceptions raised are tallied.  Returns False if a valid file failed.
+    """
+    outcomes: Dict[str, int] = {}
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="qt_fuzz_") as tmp:
+        for root, _, names in os.walk(folder):
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                work = os.path.join(tmp, name)
+                shutil.copyfile(path, work)
+                expect_valid = os.path.basename(root) == "valid"
+                try:
+                    qt = qtm.QuickTimeFile(work)
+                    qt.all_metadata()
+                    qt.set_metadata("com.apple.quicktime.comment", "fuzz")
+                    qt.save()
+                    if qtm.QuickTimeFile(work).get_metadata("com.apple.quicktime.comment") != "fuzz":
+                        raise AssertionError("metadata did not round-trip")
+                    if expect_valid:
+                        check_chunk_offsets(work)
+                    outcome = "ok"
+                except Exception as e:
+                    outcome = type(e).__name__
+                    if expect_valid:
+                        failures.append(f"{path}: {outcome}: {e}")
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                os.unlink(work)
+
+    for outcome, count in sorted(outcomes.items(), key=lambda kv: -kv[1]):
+        print(f"  {outcome:<24} {count:>6}")
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    return not failures
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def cmd_stco(args):
+    bench_stco(args.chunks, args.repeat)
+
+
+def cmd_parse(args):
+    bench_parse(args.inputs, args.repeat)
+
+
+def cmd_run(args):
+    bench_run(args.sizes, args.keys, args.repeat, args.only, args.json)
+
+
+def cmd_corpus(args):
+    count = write_corpus(args.output, args.mutations, args.seed,
+                         int(args.size_kb * 1024), args.keys)
+    print(f"Wrote {count} files to {args.output}")
+
+
+def cmd_fuzz(args):
+    if not fuzz_folder(args.folder):
+        sys.exit(1)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmarks for qt_metadata")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    s = sub.add_parser("stco", help="Compare stco/co64 fixup paths")
+    s.add_argument("--chunks", type=int, nargs="+", default=[100000, 1000000],
+                   help="chunk offset table sizes to test")
+    s.add_argument("--repeat", type=int, default=3)
+    s.set_defaults(func=cmd_stco)
+
+    r = sub.add_parser("parse", help="Compare the stream and mmap readers on real files")
+    r.add_argument("inputs", nargs="+")
+    r.add_argument("--repeat", type=int, default=3)
+    r.set_defaults(func=cmd_parse)
+
+    b = sub.add_parser("run", help="Time open/read/set/save over synthetic variants")
+    b.add_argument("--sizes", type=float, nargs="+", default=[1, 32],
+                   help="mdat sizes in MB")
+    b.add_argument("--keys", type=int, nargs="+", default=[1, 20],
+                   help="number of metadata keys already in the file")
+    b.add_argument("--repeat", type=int, default=3)
+    b.add_argument("--only", default=None,
+                   help="only variants whose name contains this, e.g. moov-last")
+    b.add_argument("--json", default=None, help="also write the results here")
+    b.set_defaults(func=cmd_run)
+
+    c = sub.add_parser("corpus", help="Write a fuzz corpus of synthetic files")
+    c.add_argument("output")
+    c.add_argument("--mutations", type=int, default=100)
+    c.add_argument("--seed", type=int, default=0)
+    c.add_argument("--size-kb", type=float, default=16)
+    c.add_argument("--keys", type=int, default=4)
+    c.set_defaults(func=cmd_corpus)
+
+    f = sub.add_parser("fuzz", help="Read/set/save every file in a corpus folder")
+    f.add_argument("folder")
+    f.set_defaults(func=cmd_fuzz)
+
+    return p
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
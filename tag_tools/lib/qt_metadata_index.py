@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+qt_metadata_index.py — Persistent, searchable index of QuickTime metadata.
+
+Caches the decoded QuickTime keys/values of every .mov/.mp4 under a folder in
+a small SQLite database, keyed by path, size and mtime.  A refresh only
+stats files; a file is re-read (lazily, on a worker pool — see
+qt_metadata.batch_read) only when its size or mtime changed or its last read
+failed.  Searches run against the database and never open the media.
+
+Usage (CLI):
+    python qt_metadata_index.py refresh /jobs/show/deliveries
+    python qt_metadata_index.py search  com.apple.quicktime.comment --entry internal_name:abc_010
+    python qt_metadata_index.py show    /jobs/show/deliveries/ABC_1000_030.mov
+    python qt_metadata_index.py --index /tmp/show.db refresh /jobs/show/deliveries
+
+Usage (API):
+    from qt_metadata_index import MetadataIndex
+
+    with MetadataIndex("/tmp/show.db") as index:
+        index.refresh("/jobs/show/deliveries")
+        for path in index.search("com.apple.quicktime.comment", entry="client_name:ABC_1000_030"):
+            print(path, index.get(path).metadata)
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from typing import Optional, Dict, List, Tuple, Iterable
+
+try:
+    from .qt_metadata import BatchResult, batch_read
+except ImportError:
+    # Run as a script from this folder.
+    from qt_metadata import BatchResult, batch_read
+
+DEFAULT_INDEX_PATH = os.path.expanduser("~/.qt_metadata_index.db")
+INDEX_EXTENSIONS   = (".mov", ".mp4")
+
+# Tag Tools stores its tags as one string, entries joined with "+".
+ENTRY_SEPARATOR    = "+"
+
+_SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    error     TEXT
+);
+CREATE TABLE IF NOT EXISTS tags (
+    path   TEXT NOT NULL,
+    key    TEXT NOT NULL,
+    value  TEXT NOT NULL,   -- JSON encoded value
+    text   TEXT             -- the value itself when it is a string, for searching
+);
+CREATE INDEX IF NOT EXISTS tags_path ON tags (path);
+CREATE INDEX IF NOT EXISTS tags_key_text ON tags (key, text);
+"""
+
+
+# ---------------------------------------------------------------------------
+# Filesystem scan
+# ---------------------------------------------------------------------------
+
+def scan_files(root: str, recursive: bool = True,
+               extensions: Tuple[str, ...] = INDEX_EXTENSIONS
+               ) -> Dict[str, Tuple[int, int]]:
+    """{path: (size, mtime_ns)} for every matching file under *root*."""
+    found: Dict[str, Tuple[int, int]] = {}
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(entry.path)
+                elif entry.name.lower().endswith(extensions):
+                    st = entry.stat()
+                    found[entry.path] = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                continue
+    return found
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class MetadataIndex:
+    """
+    SQLite-backed cache of QuickTime metadata, keyed by absolute path.
+
+    One connection per instance; create the index on the thread that uses it.
+    """
+
+    def __init__(self, index_path: str = DEFAULT_INDEX_PATH):
+        self.index_path = os.path.abspath(index_path)
+        index_dir = os.path.dirname(self.index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        self._db = sqlite3.connect(self.index_path)
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, _SCHEMA_VERSION):
+            # Built by an incompatible version — it is only a cache, start again.
+            self._db.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS tags;")
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "MetadataIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def refresh(self, root: str, recursive: bool = True,
+                extensions: Tuple[str, ...] = INDEX_EXTENSIONS,
+                workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring every matching file under *root* up to date and drop entries
+        for files that no longer exist there.  Returns counts of what was done.
+        """
+        root = os.path.abspath(root)
+        on_disk = scan_files(root, recursive, extensions)
+
+        prefix = root.rstrip(os.sep) + os.sep
+        indexed = self._db.execute(
+            "SELECT path FROM files WHERE substr(path, 1, ?) = ?",
+            (len(prefix), prefix)).fetchall()
+        gone = [p for (p,) in indexed if p not in on_disk
+                and (recursive or os.path.dirname(p) == root)]
+
+        return self._update(on_disk, gone, workers)
+
+    def refresh_paths(self, paths: Iterable[str],
+                      workers: Optional[int] = None) -> Dict[str, int]:
+        """Bring just *paths* up to date (missing files are dropped)."""
+        on_disk: Dict[str, Tuple[int, int]] = {}
+        gone: List[str] = []
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                st = os.stat(path)
+            except OSError:
+                gone.append(path)
+                continue
+            on_disk[path] = (st.st_size, st.st_mtime_ns)
+        return self._update(on_disk, gone, workers)
+
+    def _update(self, on_disk: Dict[str, Tuple[int, int]], gone: List[str],
+                workers: Optional[int]) -> Dict[str, int]:
+        known = {}
+        for chunk in _chunks(list(on_disk), 500):
+            rows = self._db.execute(
+                "SELECT path, size, mtime_ns, error FROM files WHERE path IN (%s)"
+                % ",".join("?" * len(chunk)), chunk)
+            known.update({path: ((size, mtime_ns), error) for path, size, mtime_ns, error in rows})
+
+        stale = [path for path, stamp in on_disk.items()
+                 if path not in known or known[path][0] != stamp or known[path][1] is not None]
+        results = batch_read(stale, workers=workers)
+
+        with self._db:
+            for path in gone:
+                self._forget(path)
+            for path, result in results.items():
+                self._forget(path)
+                size, mtime_ns = on_disk[path]
+                self._db.execute("INSERT INTO files VALUES (?, ?, ?, ?)",
+                                 (path, size, mtime_ns, result.error))
+                if result.ok:
+                    self._db.executemany(
+                        "INSERT INTO tags VALUES (?, ?, ?, ?)",
+                        [(path, key, json.dumps(value, default=repr),
+                          value if isinstance(value, str) else None)
+                         for key, value in result.metadata.items()])
+
+        return {
+            "scanned":   len(on_disk),
+            "updated":   sum(1 for r in results.values() if r.ok),
+            "errors":    sum(1 for r in results.values() if not r.ok),
+            "unchanged": len(on_disk) - len(stale),
+            "removed":   len(gone),
+        }
+
+    def _forget(self, path: str) -> None:
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self._db.execute("DELETE FROM tags WHERE path = ?", (path,))
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def get(self, path: str) -> Optional[BatchResult]:
+        """Cached metadata for *path* as a BatchResult, or None if not indexed."""
+        path = os.path.abspath(path)
+        row = self._db.execute("SELECT error FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        if row[0] is not None:
+            return BatchResult(path, error=row[0])
+        rows = self._db.execute("SELECT key, value FROM tags WHERE path = ?", (path,))
+        return BatchResult(path, {key: json.loads(value) for key, value in rows})
+
+    def search(self, key: str, value: Optional[str] = None,
+               contains: Optional[str] = None, root: Optional[str] = None,
+               entry: Optional[str] = None) -> List[str]:
+        """
+        Paths whose *key* is set — optionally to exactly *value*, to a
+        "+"-separated list with *entry* as one whole item, or to a string
+        containing *contains* anywhere — limited to files under *root* if given.
+
+        Use *entry* for Tag Tools tags: client_name:ABC_010 matches that tag
+        only, where contains would also match client_name:ABC_0100.
+        """
+        sql, args = "SELECT DISTINCT path FROM tags WHERE key = ?", [key]
+        if value is not None:
+            sql += " AND text = ?"
+            args.append(value)
+        if entry is not None:
+            sql += " AND instr(? || text || ?, ? || ? || ?) > 0"
+            args += [ENTRY_SEPARATOR, ENTRY_SEPARATOR, ENTRY_SEPARATOR, entry, ENTRY_SEPARATOR]
+        if contains is not None:
+            sql += " AND instr(text, ?) > 0"
+            args.append(contains)
+        if root is not None:
+            prefix = os.path.abspath(root).rstrip(os.sep) + os.sep
+            sql += " AND substr(path, 1, ?) = ?"
+            args += [len(prefix), prefix]
+        return sorted(path for (path,) in self._db.execute(sql, args))
+
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def cmd_refresh(args):
+    with MetadataIndex(args.index) as index:
+        counts = index.refresh(args.root, recursive=not args.no_recursive,
+                               workers=args.workers)
+    print("  ".join(f"{k}: {v}" for k, v in counts.items()))
+
+
+def cmd_search(args):
+    with MetadataIndex(args.index) as index:
+        paths = index.search(args.key, args.value, args.contains, args.root, args.entry)
+    for path in paths:
+        print(path)
+    if not paths:
+        sys.exit(1)
+
+
+def cmd_show(args):
+    with MetadataIndex(args.index) as index:
+        result = index.get(args.path)
+    if result is None:
+        print(f"Not indexed: {args.path}", file=sys.stderr); sys.exit(1)
+    if not result.ok:
+        print(f"Error: {result.error}", file=sys.stderr); sys.exit(1)
+    for k, v in sorted(result.metadata.items()):
+        print(f"  {k}  =  {v!r}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Persistent index of QuickTime metadata")
+    p.add_argument("--index", default=DEFAULT_INDEX_PATH,
+                   help=f"SQLite index file (default {DEFAULT_INDEX_PATH})")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("refresh", help="Index new and changed files under a folder")
+    r.add_argument("root")
+    r.add_argument("--no-recursive", action="store_true")
+    r.add_argument("--workers", "-j", type=int, default=None)
+    r.set_defaults(func=cmd_refresh)
+
+    s = sub.add_parser("search", help="List indexed files by metadata value")
+    s.add_argument("key")
+    s.add_argument("value", nargs="?", default=None, help="exact value to match")
+    s.add_argument("--entry", default=None,
+                   help="whole entry of a '+'-separated tag list the value must contain")
+    s.add_argument("--contains", default=None, help="substring the value must contain")
+    s.add_argument("--root", default=None, help="only files under this folder")
+    s.set_defaults(func=cmd_search)
+
+    sh = sub.add_parser("show", help="Print the cached metadata of one file")
+    sh.add_argument("path")
+    sh.set_defaults(func=cmd_show)
+
+    return p
+
+
+def main():
+    args = build_parser().parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
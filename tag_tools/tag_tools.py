@@ -19,7 +19,7 @@
 
 """
 Script Name:    Tag Tools
-Script Version: v1.5
+Script Version: v1.5.1
 Flame Version:  2025.1
 Written by:     Kyle Obley
 Creation Date:  12.03.26
@@ -48,6 +48,25 @@ To install:
 
 Updates:
 
+    v1.5.1 18.10.26
+        - Full QuickTime rewrites now copy the media data inside the kernel (reflink, copy_file_range
+          or sendfile, whichever the filesystem supports) instead of through Python.
+        - Added a persistent QuickTime metadata index (lib/qt_metadata_index.py) keyed by path, size
+          and mtime, kept per user in ~/.qt_metadata_index.db. Dumping metadata only re-reads files
+          that changed, and the index can be refreshed and searched by tag from the command line.
+        - Sync Tags To QT, Get Tags From QT, the metadata dump and the media hub renames now read and
+          write the QuickTimes in parallel through qt_metadata's batch API. Syncing and dumping run in
+          the background so Flame stays responsive, and report in Flame's message area when they
+          finish.
+        - Reading tags (Get Tags From QT, dumping metadata and renaming files from the media hub)
+          now only parses the metadata atoms and skips the sample tables, which can be tens of MB
+          on long-GOP masters.
+        - qt_metadata now patches moov in place when the new metadata fits in the existing moov and
+          free padding, instead of rewriting the whole QuickTime. An undo journal protects the file
+          if Flame or the machine goes down mid-write.
+        - When a QuickTime does have to be rewritten, moov is moved ahead of mdat and 64KB of free
+          padding is reserved after it so the next tag edit can be patched in place.
+
     v1.5 01.07.26
         - Added ability to use the selected sequences and try to match those to QTs at a choosen location.
           If a match is found, the tags are copied from the sequence to the QT. This allows you to bypass
@@ -92,7 +111,9 @@ import flame
 import shutil
 import csv
 import time
-from lib.qt_metadata import QuickTimeFile
+import threading
+from lib.qt_metadata import QuickTimeFile, batch_read, batch_write
+from lib.qt_metadata_index import MetadataIndex, DEFAULT_INDEX_PATH
 from lib.pyflame_lib_tag_tools import *
 
 # ==============================================================================
@@ -100,9 +121,13 @@ from lib.pyflame_lib_tag_tools import *
 # ==============================================================================
 
 SCRIPT_NAME    = 'Tag Tools'
-SCRIPT_VERSION = 'v1.4.1'
+SCRIPT_VERSION = 'v1.5.1'
 SCRIPT_PATH    = os.path.abspath(os.path.dirname(__file__))
 
+QT_TAG_KEY     = 'com.apple.quicktime.comment'
+QT_WORKERS     = 8
+QT_INDEX_PATH  = DEFAULT_INDEX_PATH  # Per user, artists can't always write to the script folder
+
 
 # ==============================================================================
 # [Helper Functions]
@@ -267,11 +292,13 @@ against the name of a .mov or .mp4.\n\nIf a match is found, then it will copy th
         # Use a directory lookup to find a match
         selection_map = {item.name.get_value(): item for item in selection}
 
+        # Read the tags from Flame here, the QTs themselves are written in the background.
+        edits = {}
         for f in files:
             base_name = os.path.splitext(f)[0]
             match = selection_map.get(base_name)
 
-            # Found a match. Extract the tags and send to post export function.
+            # Found a match. Extract the tags for the batch write.
             if match:
                 print(f"[ Tag Tools ] Match found: {match.name.get_value()} -> {f}")
                 matched_file = os.path.join(source_dir, f)
@@ -280,10 +307,36 @@ against the name of a .mov or .mp4.\n\nIf a match is found, then it will copy th
                 tags = []
                 tags = list_to_string(match.tags.get_value())
 
-                # Send to our post export function
-                set_tags_post_export(matched_file, tags)
+                edits[matched_file] = {QT_TAG_KEY: tags}
+
+        def report(result):
+            f = os.path.basename(result.path)
+            if result.ok:
+                print(f"[ Tag Tools ] Updated {f} with the following tags: {result.metadata[QT_TAG_KEY]}\n")
+            else:
+                print(f"[ Tag Tools ] Error updating {f}: {result.error}")
+
+        def write_tags():
+            try:
+                results = batch_write(edits, workers=QT_WORKERS, callback=report)
+            except Exception as e:
+                pyflame.print(f'Sync Tags To QT failed: {e}', print_type=PrintType.ERROR)
+                return
+
+            failed = sum(1 for result in results.values() if not result.ok)
+            if failed:
+                pyflame.print(f'Updated {len(results) - failed} of {len(results)} QuickTime(s), {failed} failed. See terminal.',
+                              print_type=PrintType.ERROR)
+            else:
+                pyflame.print(f'Updated {len(results)} QuickTime(s).')
+
+        if not edits:
+            pyflame.print('No QuickTimes matching the selected sequences were found.')
+            return
 
-                print(f"[ Tag Tools ] Updated {f} with the following tags: {tags}\n")
+        # Tag the files on a worker pool off the UI thread so Flame doesn't freeze. Not a daemon
+        # thread, so Flame waits for the QuickTimes being saved instead of cutting them off.
+        threading.Thread(target=write_tags).start()
 
 
 def set_internal_and_client_name(selection):
@@ -337,14 +390,18 @@ def set_audio(selection):
             print(f"[ Tag Tools ] The seuqnece {item.name.get_value()} has no audio files.")
 
 def get_tags_from_qt(selection):
-    for clip in selection:
-        path = clip.versions[0].tracks[0].segments[0].file_path
+    clip_paths = [(clip, clip.versions[0].tracks[0].segments[0].file_path) for clip in selection]
+
+    # Get the existing metadata for every clip at once
+    results = batch_read([path for clip, path in clip_paths], keys=[QT_TAG_KEY], workers=QT_WORKERS)
 
-        # Get the existing metadata
-        qt = QuickTimeFile(path)
-        metadata = qt.get_metadata("com.apple.quicktime.comment")
+    for clip, path in clip_paths:
+        result = results[path]
+        metadata = result.metadata.get(QT_TAG_KEY) if result.ok else None
 
-        if metadata == '':
+        if not result.ok:
+            print(f"[ Tag Tools ] Error: Could not read {path}: {result.error}")
+        elif not metadata:
             print(f"[ Tag Tools ] Error: The file {path} has no metadata.")
         else:
 
@@ -365,7 +422,7 @@ def set_tags_post_export(full_path, tags):
     #print(f"Set Tags Post :Tags: {tags}")
 
     qt = QuickTimeFile(full_path)
-    qt.set_metadata("com.apple.quicktime.comment", tags)
+    qt.set_metadata(QT_TAG_KEY, tags)
     qt.save(full_path)
 
 
@@ -434,7 +491,7 @@ def create_backburner_job(job_name, description, dependencies, cmd):
     print(stdout)
 
     job_id_regex = re.compile(r"(?<=Successfully submitted job )(\d+)")
-    match = job_id_regex.search(stdout)
+    match = job_id_regex.search(stdout or "")
 
     if match:
         backburner_job_id = match.group(0)
@@ -499,7 +556,7 @@ def execute_command(command):
     else:
         import subprocess
 
-        process = subprocess.Popen([command], stdout=subprocess.PIPE, shell=True)
+        process = subprocess.Popen([command], stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
         stdout, stderr = process.communicate()
         stdout = stdout.decode("utf-8") if stdout else None
         stderr = stderr.decode("utf-8") if stderr else None
@@ -711,30 +768,56 @@ class tag_tools_export:
 # [Filesystem Funections]
 # ==============================================================================
 def fs_dump_metadata_to_terminal(selection):
-    for item in selection:
-        path = item.path
-        basename = os.path.basename(path)
+    paths = [item.path for item in selection]
 
-        qt = QuickTimeFile(path)
-        metadata = qt.get_metadata("com.apple.quicktime.comment")
+    def dump(result):
+        basename = os.path.basename(result.path)
+        metadata = result.metadata.get(QT_TAG_KEY) if result.ok else None
 
-        if metadata:
+        if not result.ok:
+            print(f"[ Tag Tools ] Metadata dump for {basename} -> Error: {result.error}")
+        elif metadata:
             # Convert the string to a list and set as the tag
             meta_list = string_to_list(metadata)
             print(f"[ Tag Tools ] Metadata dump for {basename} -> {meta_list}")
         else:
             print(f"[ Tag Tools ] Metadata dump for {basename} -> None")
 
+    # Only files that changed since the last dump are actually opened, the rest
+    # come straight from the metadata index.
+    def dump_from_index():
+        try:
+            with MetadataIndex(QT_INDEX_PATH) as index:
+                index.refresh_paths(paths, workers=QT_WORKERS)
+                for path in paths:
+                    result = index.get(path)
+
+                    # refresh_paths drops files that have gone from disk since they were selected.
+                    if result is None:
+                        print(f"[ Tag Tools ] Metadata dump for {os.path.basename(path)} -> File not found")
+                    else:
+                        dump(result)
+        except Exception as e:
+            pyflame.print(f'Metadata dump failed: {e}', print_type=PrintType.ERROR)
+            return
+
+        pyflame.print(f'Dumped metadata for {len(paths)} file(s) to the terminal.')
+
+    # Only prints, so do it in the background and keep Flame responsive.
+    threading.Thread(target=dump_from_index, daemon=True).start()
+
 
-def fs_rename_qt(file, tag_name):
+def fs_rename_qt(file, tag_name, result):
     path = os.path.dirname(file)
     basename = os.path.basename(file)
     ext = os.path.splitext(file)[1]
 
-    qt = QuickTimeFile(file)
-    metadata = qt.get_metadata("com.apple.quicktime.comment")
+    metadata = result.metadata.get(QT_TAG_KEY) if result.ok else None
 
-    if metadata:
+    if not result.ok:
+        print (f"[ Tag Tools ] Error reading {basename}: {result.error}")
+
+    elif metadata:
         meta_list = string_to_list(metadata)
         found_tag = False
 
@@ -759,17 +842,23 @@ def fs_rename_qt(file, tag_name):
     else:
         print (f"[ Tag Tools ] Error {basename} doesn't have any metadata")
 
+
+def fs_rename_qts(selection, tag_name):
+    # Read all the tags up front, then rename one by one.
+    paths = [item.path for item in selection]
+    results = batch_read(paths, keys=[QT_TAG_KEY], workers=QT_WORKERS)
+
+    for path, result in results.items():
+        fs_rename_qt(path, tag_name, result)
+
     # Refresh the media panel at the end of everything
     flame.execute_shortcut('Refresh the MediaHub\'s Folders and Files')
 
-
 def fs_rename_to_client(selection):
-    for item in selection:
-        fs_rename_qt(item.path, "client_name")
+    fs_rename_qts(selection, "client_name")
 
 def fs_rename_to_internal(selection):
-    for item in selection:
-        fs_rename_qt(item.path, "internal_name")
+    fs_rename_qts(selection, "internal_name")
 
 # ==============================================================================
 # [CSV Funections]